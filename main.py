@@ -1,5 +1,17 @@
+import argparse
 from src.fillerapp import FillerApp
 
 if __name__ == "__main__":
-    app = FillerApp()
+    parser = argparse.ArgumentParser(description="Filler engine and board visualizer")
+    parser.add_argument("--workers", type=int, default=1, help="search processes (1 searches in-process)")
+    parser.add_argument("--depth", type=int, default=None, help="deepest search in plies (default 10, or 60 with --time)")
+    parser.add_argument("--time", type=float, default=None, help="seconds the engine may think per position")
+    parser.add_argument("--book", default=None, help="opening book built with python -m src.book")
+    parser.add_argument("--records", default="games.frec", help="game archive the S key saves the current game to")
+    parser.add_argument("--no-ponder", action="store_true", help="don't search the replies while waiting for a move")
+    args = parser.parse_args()
+
+    depth = args.depth or (60 if args.time else 10)
+    app = FillerApp(workers=args.workers, max_depth=depth, time_limit=args.time, ponder=not args.no_ponder,
+                    book=args.book, records=args.records)
     app.run()
@@ -0,0 +1,127 @@
+"""Headless engine analysis.
+
+Reads positions as JSON lines ({"board": 7x8 color grid, "player": side to move, "id": optional})
+or as screenshots, and writes one JSON line per position:
+
+    python -m src.analyze positions.jsonl screenshots/*.png --time 1 --workers 8 > results.jsonl
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import math
+import sys
+from .board import Board
+from .engine import Engine
+from .telemetry import new_phases
+
+image_extensions = [".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"]
+
+def read_positions(sources: list[str]):
+    """Yields position dicts from JSON-lines files, screenshots, directories of screenshots, or
+    stdin ("-")"""
+    detector = None
+    for source in sources:
+        if source != "-" and Path(source).is_dir():
+            from .griddetection import image_paths
+            yield from read_positions([str(path) for path in image_paths([source])])
+            continue
+        if Path(source).suffix.lower() in image_extensions:
+            if detector is None:
+                from .griddetection import GridDetection
+                detector = GridDetection()
+            try:
+                detector.process(source)
+            except ValueError as e:
+                yield {"id": source, "error": str(e)}
+                continue
+            yield {"id": source, "board": detector.get_board(), "player": 0}
+            continue
+
+        lines = sys.stdin if source == "-" else open(source)
+        with lines:
+            for i, line in enumerate(lines):
+                line = line.strip()
+                if not line:
+                    continue
+                position_id = f"{source}:{i + 1}"
+                try:
+                    position = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {"id": position_id, "error": f"bad JSON: {e}"}
+                    continue
+                if not isinstance(position, dict):
+                    yield {"id": position_id, "error": "bad JSON: expected an object"}
+                    continue
+                position.setdefault("id", position_id)
+                yield position
+
+def json_score(score: float):
+    if math.isfinite(score):
+        return score
+    return "inf" if score > 0 else "-inf"
+
+def analyze_position(position: dict, depth: int = 10, time_limit: float = None, node_limit: int = None,
+                     telemetry: bool = False, phases: bool = False) -> dict:
+    """Runs one Engine search and reports the best move, eval, PV, depth reached and node count,
+    plus per-iteration search stats with telemetry (and per-phase timings with phases)"""
+    if "error" in position:
+        return position
+    player = position.get("player", 0)
+    if player not in (0, 1):
+        return {"id": position.get("id"), "error": f"bad player: {player!r}"}
+    try:
+        engine = Engine(Board(position["board"]))
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return {"id": position.get("id"), "error": f"bad board: {e}"}
+    if phases:
+        engine.phases = new_phases()
+    score, path = engine.search(player, depth, time_limit=time_limit, node_limit=node_limit)
+    result = {
+        "id": position.get("id"),
+        "player": player,
+        "move": path[0].name if path else None,
+        "eval": json_score(score),
+        "pv": [color.name for color in path],
+        "depth": engine.completed_depth,
+        "nodes": engine.count,
+    }
+    if telemetry or phases:
+        result["iterations"] = engine.iterations
+    return result
+
+def _analyze(args):
+    return analyze_position(*args)
+
+def analyze_positions(positions, depth: int = 10, time_limit: float = None, node_limit: int = None, workers: int = 1,
+                      telemetry: bool = False, phases: bool = False):
+    """Yields analyze_position results in input order, spreading positions over worker processes"""
+    jobs = ((position, depth, time_limit, node_limit, telemetry, phases) for position in positions)
+    if workers <= 1:
+        yield from map(_analyze, jobs)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(_analyze, jobs, chunksize=4)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze Filler positions without the TUI")
+    parser.add_argument("sources", nargs="*", default=["-"], help="JSON-lines files, screenshots, directories of them, or - for stdin")
+    parser.add_argument("--depth", type=int, default=None, help="deepest search in plies (default 10, or 60 with --time/--nodes)")
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="node budget per position")
+    parser.add_argument("--workers", type=int, default=1, help="positions analyzed in parallel")
+    parser.add_argument("--stats", action="store_true", help="include per-iteration search stats")
+    parser.add_argument("--phases", action="store_true", help="include time spent generating moves, moving, undoing and evaluating (slower)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default stdout)")
+    args = parser.parse_args(argv)
+
+    depth = args.depth or (60 if args.time or args.nodes else 10)
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    with out:
+        for result in analyze_positions(read_positions(args.sources), depth, args.time, args.nodes, args.workers,
+                                        args.stats, args.phases):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import numpy as np
+from .board import Board, default_weights
+
+def popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.int64)
+    # numpy < 2.0
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+class BatchEvaluator:
+    """Board.eval over many leaf positions of one game at once.
+
+    Leaves are (owned[0], owned[1], frontiers[0], frontiers[1], board_control[0], board_control[1])
+    tuples, as returned by Board.leaf_state. Color layout never changes during a game, so the
+    per-color masks are stacked once up front."""
+
+    def __init__(self, board: Board):
+        self.color_masks = np.array(board.color_masks, dtype=np.uint64)
+        self.full = np.uint64(board.full)
+
+    def normalize_log(self, x: np.ndarray) -> np.ndarray:
+        """Board.normalize_log, elementwise"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log = np.log(x)
+            return np.where(x == 0, 0.0, 1 + 2 * (log / (1 + np.abs(log))))
+
+    def evaluate(self, leaves: list[tuple], player: int, weights: tuple = default_weights) -> np.ndarray:
+        masks = np.array([leaf[:4] for leaf in leaves], dtype=np.uint64)
+        control = np.array([leaf[4:] for leaf in leaves], dtype=np.float64)
+
+        tiles = popcount(masks[:, :2])
+        buckets = popcount(masks[:, 2:, None] & self.color_masks[None, None, :]).max(axis=2)
+        scores = weights[0] * tiles + weights[1] * self.normalize_log(control) + weights[2] * buckets
+        result = scores[:, player] - scores[:, player ^ 1]
+
+        finished = (masks[:, 0] | masks[:, 1]) == self.full
+        if finished.any():
+            margin = tiles[:, player] - tiles[:, player ^ 1]
+            outcome = np.where(margin > 0, np.inf, np.where(margin < 0, -np.inf, 0.0))
+            result = np.where(finished, outcome, result)
+        return result
@@ -0,0 +1,158 @@
+"""Engine speed benchmark over a fixed corpus of positions.
+
+    python -m src.benchmark --depth 8 --save bench.json
+    python -m src.benchmark --depth 8 --compare bench.json
+
+Corpus lines are {"id", "board", "moves", "player"}: the initial grid, the colors played
+alternately from player 0, and the side to move. Screenshots in assets/ are added through
+GridDetection when OpenCV is available. Saved results can be compared against a later run,
+which exits non-zero if any metric regressed past the tolerance.
+"""
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+from .board import Board
+from .engine import Engine
+from .parallel import ParallelEngine
+from .tile import Colors
+
+corpus_path = Path(__file__).resolve().parent.parent / "benchmarks" / "corpus.jsonl"
+assets_path = Path(__file__).resolve().parent.parent / "assets"
+
+def position_board(position: dict) -> Board:
+    board = Board(position["board"])
+    player = 0
+    for color in position.get("moves", []):
+        board.move(Colors(color), player)
+        player ^= 1
+    return board
+
+def load_corpus(path: Path = corpus_path, assets: bool = True) -> list[dict]:
+    with open(path) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    if assets:
+        try:
+            from .griddetection import GridDetection
+        except ImportError:
+            return corpus
+        detector = GridDetection()
+        for image in sorted(assets_path.iterdir()):
+            try:
+                detector.process(str(image))
+                corpus.append({"id": f"assets/{image.name}", "board": detector.get_board(), "moves": [], "player": 0})
+            except ValueError:
+                continue
+    return corpus
+
+def run_position(position: dict, depth: int, engine_factory=Engine) -> dict:
+    """Searches one position from a cold engine and measures it"""
+    engine = engine_factory(position_board(position))
+    times = {}
+    nodes = {}
+    start = time.perf_counter()
+
+    def callback(path, eval):
+        times[engine.completed_depth] = time.perf_counter() - start
+        nodes[engine.completed_depth] = engine.count
+
+    try:
+        engine.search(position.get("player", 0), depth, callback)
+    finally:
+        engine.close()
+    elapsed = time.perf_counter() - start
+
+    # per-ply growth of the last iteration's node count over the one before it
+    reached = max(nodes, default=0)
+    ebf = None
+    if reached >= 4 and nodes.get(reached - 2):
+        ebf = ((nodes[reached] - nodes[reached - 2]) / max(1, nodes[reached - 2] - nodes.get(reached - 4, 0))) ** 0.5
+    return {
+        "depth": reached,
+        "nodes": engine.count,
+        "seconds": elapsed,
+        "nodes_per_sec": engine.count / elapsed if elapsed else 0.0,
+        "time_to_depth": times,
+        "ebf": ebf,
+        "first_move_cutoff_rate": engine.first_cutoffs / engine.cutoffs if engine.cutoffs else None,
+    }
+
+def summarize(results: dict) -> dict:
+    runs = list(results.values())
+    nodes = sum(r["nodes"] for r in runs)
+    seconds = sum(r["seconds"] for r in runs)
+    ebfs = [r["ebf"] for r in runs if r["ebf"] is not None]
+    rates = [r["first_move_cutoff_rate"] for r in runs if r["first_move_cutoff_rate"] is not None]
+    return {
+        "nodes": nodes,
+        "seconds": seconds,
+        "nodes_per_sec": nodes / seconds if seconds else 0.0,
+        "ebf": sum(ebfs) / len(ebfs) if ebfs else None,
+        "first_move_cutoff_rate": sum(rates) / len(rates) if rates else None,
+    }
+
+def run(corpus: list[dict], depth: int, engine_factory=Engine) -> dict:
+    results = {position["id"]: run_position(position, depth, engine_factory) for position in corpus}
+    return {"depth": depth, "created": time.time(), "summary": summarize(results), "positions": results}
+
+# metric -> True if bigger is better
+tracked = {"nodes_per_sec": True, "seconds": False, "nodes": False, "first_move_cutoff_rate": True}
+
+def regressions(baseline: dict, current: dict, tolerance: float = 0.1) -> list[str]:
+    """Metrics in current that are worse than baseline by more than tolerance (a fraction)"""
+    found = []
+    if baseline.get("depth") != current.get("depth"):
+        return [f"depth differs: baseline {baseline.get('depth')}, current {current.get('depth')}"]
+    pairs = [("summary", baseline["summary"], current["summary"])]
+    pairs += [(pid, baseline["positions"][pid], run) for pid, run in current["positions"].items()
+              if pid in baseline["positions"]]
+    for name, old, new in pairs:
+        for metric, higher_is_better in tracked.items():
+            if old.get(metric) is None or new.get(metric) is None or not old[metric]:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            if (-change if higher_is_better else change) > tolerance:
+                found.append(f"{name}: {metric} {old[metric]:.4g} -> {new[metric]:.4g} ({change:+.1%})")
+    return found
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark engine search speed on a fixed corpus")
+    parser.add_argument("--depth", type=int, default=8, help="search depth in plies")
+    parser.add_argument("--corpus", type=Path, default=corpus_path)
+    parser.add_argument("--no-assets", action="store_true", help="skip screenshots in assets/")
+    parser.add_argument("--save", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed fractional slowdown")
+    parser.add_argument("--lmr", type=int, default=0, help="late-move reduction in plies (default off)")
+    parser.add_argument("--futility", type=float, default=0.0, help="futility margin at depth 1 (default off)")
+    parser.add_argument("--dead-moves", choices=("prune", "reduce"), default=None,
+                        help="prune or reduce moves that capture nothing (default off)")
+    parser.add_argument("--workers", type=int, default=1, help="search processes, see src.parallel (default 1)")
+    args = parser.parse_args(argv)
+
+    def engine_factory(board):
+        engine = ParallelEngine(board, args.workers) if args.workers > 1 else Engine(board)
+        engine.lmr, engine.futility, engine.dead_moves = args.lmr, args.futility, args.dead_moves
+        return engine
+
+    result = run(load_corpus(args.corpus, not args.no_assets), args.depth, engine_factory)
+    for pid, r in result["positions"].items():
+        rate = r["first_move_cutoff_rate"]
+        print(f"{pid:28} depth {r['depth']:2}  nodes {r['nodes']:8}  {r['nodes_per_sec']:9.0f} n/s  "
+              f"{r['seconds']:7.3f}s  ebf {r['ebf'] or 0:5.2f}  first-cut {rate or 0:.1%}")
+    s = result["summary"]
+    print(f"{'total':28} nodes {s['nodes']:8}  {s['nodes_per_sec']:9.0f} n/s  {s['seconds']:7.3f}s  "
+          f"ebf {s['ebf'] or 0:5.2f}  first-cut {s['first_move_cutoff_rate'] or 0:.1%}")
+
+    if args.save:
+        args.save.write_text(json.dumps(result, indent=1))
+    if args.compare:
+        found = regressions(json.loads(args.compare.read_text()), result, args.tolerance)
+        for line in found:
+            print("REGRESSION", line)
+        if found:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,113 @@
 from .tile import Tile, Colors
+from functools import lru_cache
 import math
 import random
 
+# fixed seed so every process (and every run) agrees on position keys
+_zobrist_rng = random.Random(0xF111E4)
+ZOBRIST_COLORS = [[_zobrist_rng.getrandbits(64) for _ in Colors] for _ in range(2)]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+
+# eval weights: tiles owned, normalize_log of corner control, and the largest frontier color bucket
+default_weights = (1.0, 1.0, 1.0)
+
+def corner_dist_gradient(x: int, y: int, player: int, n: int = 7, m: int = 8) -> float:
+    cx, cy = (n - 1, 0) if player == 0 else (0, m - 1)
+    dx = x - cx
+    dy = y - cy
+    dist = (dx ** 2 + dy ** 2) ** 0.5
+    max_dist = (n ** 2 + m ** 2) ** 0.5
+    norm_dist = dist / max_dist
+    return 1 - pow(2, -5 * norm_dist)
+
+class Tables:
+    """Lookup tables for an n x m board, indexed by bit position i * m + j"""
+
+    def __init__(self, n: int, m: int):
+        self.full = (1 << (n * m)) - 1
+        self.not_first_col = 0
+        self.not_last_col = 0
+        for i in range(n):
+            for j in range(m):
+                if j != 0:
+                    self.not_first_col |= 1 << (i * m + j)
+                if j != m - 1:
+                    self.not_last_col |= 1 << (i * m + j)
+
+        self.neighbor_cells = []
+        for i in range(n):
+            for j in range(m):
+                self.neighbor_cells.append([(i + dx) * m + j + dy for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0))
+                                            if 0 <= i + dx < n and 0 <= j + dy < m])
+
+        self.gradient = [[corner_dist_gradient(idx // m, idx % m, p, n, m) for idx in range(n * m)] for p in range(2)]
+
+        rng = random.Random(f"zobrist {n}x{m}")
+        self.zobrist = [[rng.getrandbits(64) for _ in range(n * m)] for _ in range(2)]
+
+@lru_cache(maxsize=None)
+def tables(n: int, m: int) -> Tables:
+    return Tables(n, m)
+
 class Board:
-    n = 7 
+    """Bitboard-backed game state.
+
+    Cell (i, j) is bit i * m + j. `color_masks[c]` holds every cell of color c
+    and `owned[p]` holds the cells captured by player p. Colors are int codes
+    throughout; Colors members can be passed anywhere one is expected."""
+    n = 7
     m = 8
     dx = [0, 0, 1, -1]
     dy = [1, -1, 0, 0]
+    __slots__ = ("tables", "full", "not_first_col", "not_last_col", "color_masks", "owned", "frontiers",
+                 "player_colors", "board_control", "stack", "hash")
 
     def __init__(self, _board: list[list[int]] = [[]]):
         """Generates a random board on empty constructor"""
-        self.board = [[Tile(Colors(Colors.empty), i, j) for j in range(8)] for i in range(7)]
-        self.player_colors = [Colors.empty, Colors.empty]
-        self.player_tiles = [[], []] # assumes we are 0, opp is 1
-        self.board_control = [0.0, 0.0]
-
         if (_board == [[]]):
             _board = self.gen_random()
 
+        self.tables = tables(self.n, self.m)
+        self.full = self.tables.full
+        self.not_first_col = self.tables.not_first_col
+        self.not_last_col = self.tables.not_last_col
+        self.color_masks = [0] * len(Colors)
+        colors = len(Colors)
+        bit = 1
         for i in range(self.n):
+            row = _board[i]
             for j in range(self.m):
-                self.board[i][j] = Tile(Colors(_board[i][j]), i, j)
-
-        self.board[self.n - 1][0].owner = 0 
-        self.board[0][self.m - 1].owner = 1 
-        self.player_tiles[0].append(self.board[self.n - 1][0])
-        self.player_tiles[1].append(self.board[0][self.m - 1])
-        self.player_colors[0] = self.board[self.n - 1][0].color
-        self.player_colors[1] = self.board[0][self.m - 1].color
+                color = row[j]
+                if not 0 <= color < colors:
+                    raise ValueError(f"{color} is not a valid Colors")
+                self.color_masks[color] |= bit
+                bit <<= 1
+
+        self.owned = [self.bit(self.n - 1, 0), self.bit(0, self.m - 1)] # assumes we are 0, opp is 1
+        occupied = self.owned[0] | self.owned[1]
+        self.frontiers = [self.neighbors(self.owned[0]) & ~occupied, self.neighbors(self.owned[1]) & ~occupied]
+        self.player_colors = [int(_board[self.n - 1][0]), int(_board[0][self.m - 1])]
+        self.board_control = [0.0, 0.0]
         self.stack = []
+        self.hash = (self.tables.zobrist[0][(self.n - 1) * self.m] ^ self.tables.zobrist[1][self.m - 1]
+                     ^ ZOBRIST_COLORS[0][self.player_colors[0]] ^ ZOBRIST_COLORS[1][self.player_colors[1]])
 
         # if board state is not from starting then make sure adj tiles of same color to corners work
         for i in range(2):
-            while (len(self.get_adjacent_unowned(i).get(self.player_colors[i], []))):
+            while self.capture_size(self.player_colors[i], i):
                 self.move(self.player_colors[i], i, False)
 
+    def __getstate__(self):
+        """Pickles without the lookup tables, which are rebuilt from the size on load"""
+        return tuple(getattr(self, name) for name in Board.__slots__[1:])
+
+    def __setstate__(self, state):
+        self.tables = tables(self.n, self.m)
+        for name, value in zip(Board.__slots__[1:], state):
+            setattr(self, name, value)
+
     def gen_random(self):
+        neighbor_cells = tables(self.n, self.m).neighbor_cells
         board = [[-1 for j in range(self.m)] for i in range(self.n)]
         for i in range(self.n):
             for j in range(self.m):
@@ -46,72 +118,112 @@ class Board:
                 if (board[i][j] != -1):
                     continue
                 open = set(range(6))
-                adj = set()
-                for k in range(4):
-                    nx = i + self.dx[k]
-                    ny = j + self.dy[k]
-                    if (0 <= nx < self.n and 0 <= ny < self.m):
-                        adj.add(board[nx][ny])
+                adj = set(board[idx // self.m][idx % self.m] for idx in neighbor_cells[i * self.m + j])
                 board[i][j] = random.choice(list(open - adj))
         return board
-        
+
+    def bit(self, x: int, y: int) -> int:
+        return 1 << (x * self.m + y)
+
+    def neighbors(self, mask: int) -> int:
+        """Cells orthogonally adjacent to any cell in mask"""
+        return (((mask << 1) & self.not_first_col)
+                | ((mask >> 1) & self.not_last_col)
+                | (mask << self.m)
+                | (mask >> self.m)) & self.full
+
+    def frontier(self, player: int) -> int:
+        """Unowned cells adjacent to player's territory, kept up to date by move/undo_move"""
+        return self.frontiers[player]
+
+    def capture_size(self, color: Colors, player: int) -> int:
+        """Tiles player would take by moving to color"""
+        return (self.frontiers[player] & self.color_masks[color]).bit_count()
+
+    def key(self, player: int) -> int:
+        """Zobrist key of ownership, player colors and player to move"""
+        return self.hash ^ ZOBRIST_SIDE if player else self.hash
+
+    def color_at(self, x: int, y: int) -> Colors:
+        bit = self.bit(x, y)
+        for c, mask in enumerate(self.color_masks):
+            if mask & bit:
+                return Colors(c)
+        return Colors.empty
+
+    def owner_at(self, x: int, y: int) -> int:
+        bit = self.bit(x, y)
+        if self.owned[0] & bit:
+            return 0
+        if self.owned[1] & bit:
+            return 1
+        return -1
+
+    def tile_count(self, player: int) -> int:
+        return self.owned[player].bit_count()
+
+    @property
+    def board(self) -> list[list[Tile]]:
+        """Tile grid view, built on demand for display code"""
+        return [[Tile(self.color_at(i, j), i, j, self.owner_at(i, j)) for j in range(self.m)] for i in range(self.n)]
+
+    @property
+    def player_tiles(self) -> list[list[Tile]]:
+        tiles = [[], []]
+        for row in self.board:
+            for tile in row:
+                if tile.owner != -1:
+                    tiles[tile.owner].append(tile)
+        return tiles
+
     def get_adjacent_unowned(self, player):
         adj_tiles = {}
-        visited = set()
+        frontier = self.frontiers[player]
         for c in Colors:
             adj_tiles[c] = []
-        for tile in list(self.player_tiles[player]):
-            for i in range(4):
-                nx = tile.x + self.dx[i]
-                ny = tile.y + self.dy[i]
-                if (nx, ny) in visited:
-                    continue
-                visited.add((nx, ny))
-                if (not self.inside_board(nx, ny) 
-                    or self.board[nx][ny].owner != -1 
-                ):
-                    continue
-                adj_tiles[self.board[nx][ny].color].append((nx, ny))
+            mask = frontier & self.color_masks[c]
+            while mask:
+                low = mask & -mask
+                idx = low.bit_length() - 1
+                adj_tiles[c].append((idx // self.m, idx % self.m))
+                mask ^= low
         return adj_tiles
-    
+
     def undo_move(self):
         if (len(self.stack) == 0):
             return False
-        cur = self.stack[-1]
-        for i in range(cur[1], len(self.player_tiles[cur[0]])):
-            self.player_tiles[cur[0]][i].owner = -1 
-        del self.player_tiles[cur[0]][cur[1]:]
-        self.player_colors[cur[0]] = cur[2]
-        self.board_control[cur[0]] = cur[3]
-        self.stack.pop()
+        player, owned, color, control, frontiers, hash = self.stack.pop()
+        self.owned[player] = owned
+        self.hash = hash
+        self.frontiers = frontiers
+        self.player_colors[player] = color
+        self.board_control[player] = control
         return True
-        
+
     def clone(self):
-        new = Board.__new__(Board) 
-        new.n = self.n
-        new.m = self.m
-        new.dx = self.dx
-        new.dy = self.dy
-        new.board = [[tile.copy() for tile in row] for row in self.board]
-        new.player_tiles = [[], []]
-        for p in range(2):
-            for tile in self.player_tiles[p]:
-                new_tile = new.board[tile.x][tile.y]
-                new.player_tiles[p].append(new_tile)
+        new = self.__class__.__new__(self.__class__)
+        new.tables = self.tables
+        new.full = self.full
+        new.not_first_col = self.not_first_col
+        new.not_last_col = self.not_last_col
+        new.color_masks = self.color_masks
+        new.owned = list(self.owned)
+        new.frontiers = list(self.frontiers)
         new.player_colors = list(self.player_colors)
         new.stack = list(self.stack)
         new.board_control = list(self.board_control)
+        new.hash = self.hash
         return new
 
     def inside_board(self, x: int, y: int):
         return 0 <= x < self.n and 0 <= y < self.m
 
     # -1 if moves can still be made, 0/1 for player win, 2 for draw
-    def win(self): 
-        if (len(self.player_tiles[0]) + len(self.player_tiles[1]) != 56):
+    def win(self):
+        if ((self.owned[0] | self.owned[1]) != self.full):
             return -1
-        x = len(self.player_tiles[0])
-        y = len(self.player_tiles[1])
+        x = self.owned[0].bit_count()
+        y = self.owned[1].bit_count()
         if x == y:
             return 2
         return 0 if x > y else 1
@@ -120,28 +232,39 @@ class Board:
         if color_check and color in self.player_colors:
             return False
 
-        new_tiles = []
-        adj_tiles = self.get_adjacent_unowned(player)
+        free = self.color_masks[color] & ~(self.owned[0] | self.owned[1])
+        captured = 0
+        grow = self.frontiers[player] & free
+        while grow:
+            captured |= grow
+            grow = self.neighbors(grow) & free & ~captured
+
         sum = 0
-        for nx, ny in adj_tiles[color]:
-            self.board[nx][ny].owner = player
-            new_tiles.append(self.board[nx][ny])
-            sum += self.corner_dist_gradient(nx, ny, player)
-        self.stack.append((player, len(self.player_tiles[player]), self.player_colors[player], self.board_control[player]))
+        hash = self.hash ^ ZOBRIST_COLORS[player][self.player_colors[player]] ^ ZOBRIST_COLORS[player][color]
+        cell_keys = self.tables.zobrist[player]
+        gradient = self.tables.gradient[player]
+        mask = captured
+        while mask:
+            low = mask & -mask
+            idx = low.bit_length() - 1
+            sum += gradient[idx]
+            hash ^= cell_keys[idx]
+            mask ^= low
+        self.stack.append((player, self.owned[player], self.player_colors[player], self.board_control[player], self.frontiers, self.hash))
+        self.hash = hash
         self.board_control[player] += sum
         self.player_colors[player] = color
-        self.player_tiles[player].extend(new_tiles)
+        self.owned[player] |= captured
+        if captured:
+            frontiers = list(self.frontiers)
+            frontiers[player] = (frontiers[player] | self.neighbors(captured)) & ~(self.owned[0] | self.owned[1])
+            frontiers[player ^ 1] &= ~captured
+            self.frontiers = frontiers
         return True
-        
+
 
     def corner_dist_gradient(self, x: int, y: int, player: int, n: int = 7, m: int = 8) -> float:
-        cx, cy = (n - 1, 0) if player == 0 else (0, m - 1)
-        dx = x - cx
-        dy = y - cy
-        dist = (dx ** 2 + dy ** 2) ** 0.5
-        max_dist = (n ** 2 + m ** 2) ** 0.5
-        norm_dist = dist / max_dist 
-        return 1 - pow(2, -5 * norm_dist)
+        return corner_dist_gradient(x, y, player, n, m)
 
     def normalize_log(self, x):
         """For nonnegative inputs: [0, 3)"""
@@ -149,14 +272,26 @@ class Board:
             return 0
         return (1 + 2 * (math.log(x) / (1 + abs(math.log(x)))))
 
-    def eval(self, player: int):
+    def leaf_state(self) -> tuple:
+        """Everything eval reads, for handing positions to a BatchEvaluator"""
+        return (self.owned[0], self.owned[1], self.frontiers[0], self.frontiers[1],
+                self.board_control[0], self.board_control[1])
+
+    def largest_bucket(self, player: int) -> int:
+        frontier = self.frontiers[player]
+        return max((frontier & mask).bit_count() for mask in self.color_masks)
+
+    def eval(self, player: int, weights: tuple = default_weights):
         winner = self.win()
         if winner != -1:
             if winner == 2:
                 return 0
             return float('inf') if winner == player else float('-inf')
-        us = len(self.player_tiles[player]) + self.normalize_log(self.board_control[player])
-        them = len(self.player_tiles[player ^ 1]) + self.normalize_log(self.board_control[player ^ 1])
-        us += len(max(self.get_adjacent_unowned(player).values(), key=lambda x: len(x), default = []))
-        them += len(max(self.get_adjacent_unowned(player ^ 1).values(), key=lambda x: len(x), default = []))
+        tiles, control, frontier = weights
+        us = tiles * self.owned[player].bit_count() + control * self.normalize_log(self.board_control[player])
+        them = tiles * self.owned[player ^ 1].bit_count() + control * self.normalize_log(self.board_control[player ^ 1])
+        us += frontier * self.largest_bucket(player)
+        them += frontier * self.largest_bucket(player ^ 1)
         return us - them
+
+tables(Board.n, Board.m)
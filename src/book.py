@@ -0,0 +1,165 @@
+"""Opening book: deep searches of early positions, computed offline and looked up before searching.
+
+Positions are keyed by a canonical hash of the color layout plus the position the move history
+reached (ownership, both players' colors, side to move). Colors are relabeled by where they first
+appear on the board, so a board whose colors are merely permuted shares entries. Building searches
+each given position and every position up to --plies moves after it:
+
+    python -m src.book positions.jsonl screenshots/ --random 200 --plies 2 --depth 14 --workers 8 -o book.bin
+
+The file is a short header followed by fixed-size records sorted by key, and is memory-mapped, so
+loading it costs nothing up front and many processes can share one copy.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from pathlib import Path
+import argparse
+import math
+import random
+import sys
+import numpy as np
+from .board import Board
+from .engine import Engine, move_colors
+
+magic = b"FBOOK1\0\0"
+record = np.dtype([("key", "<u8"), ("score", "<f4"), ("depth", "u1"), ("move", "u1")])
+
+def canonical(board: Board, player: int) -> tuple[int, list[int]]:
+    """Book key of the position, and the map from the board's color codes to canonical ones"""
+    order = sorted(move_colors, key=lambda c: (board.color_masks[c] & -board.color_masks[c]) or math.inf)
+    relabel = [0] * len(board.color_masks)
+    for code, color in enumerate(order):
+        relabel[color] = code
+    size = (board.n * board.m + 7) // 8
+    digest = blake2b(digest_size=8)
+    for color in order:
+        digest.update(board.color_masks[color].to_bytes(size, "little"))
+    digest.update(board.owned[0].to_bytes(size, "little"))
+    digest.update(board.owned[1].to_bytes(size, "little"))
+    digest.update(bytes([relabel[board.player_colors[0]], relabel[board.player_colors[1]], player, board.n, board.m]))
+    return int.from_bytes(digest.digest(), "little"), relabel
+
+class OpeningBook:
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            if f.read(len(magic)) != magic:
+                raise ValueError(f"{path} is not an opening book")
+        if Path(path).stat().st_size > len(magic):
+            self.entries = np.memmap(path, dtype=record, mode="r", offset=len(magic))
+        else:
+            self.entries = np.zeros(0, dtype=record)
+        self.keys = self.entries["key"]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def probe(self, board: Board, player: int):
+        """(depth, score for player, move) if the position is in the book, otherwise None"""
+        key, relabel = canonical(board, player)
+        i = np.searchsorted(self.keys, np.uint64(key))
+        if i == len(self.keys) or int(self.keys[i]) != key:
+            return None
+        entry = self.entries[i]
+        return int(entry["depth"]), float(entry["score"]), relabel.index(int(entry["move"]))
+
+    def line(self, board: Board, player: int, length: int) -> list[int]:
+        """Book moves from the position for as long as the book covers the positions they lead to"""
+        board = board.clone()
+        line = []
+        while len(line) < length and board.win() == -1:
+            entry = self.probe(board, player)
+            if entry is None or not board.move(entry[2], player):
+                break
+            line.append(entry[2])
+            player ^= 1
+        return line
+
+    @staticmethod
+    def write(path: Path, entries: dict):
+        """entries maps key -> (depth, score, canonical move); deeper entries win on rebuilds"""
+        table = np.zeros(len(entries), dtype=record)
+        for i, key in enumerate(sorted(entries)):
+            depth, score, move = entries[key]
+            table[i] = (key, score, min(depth, 255), move)
+        with open(path, "wb") as f:
+            f.write(magic)
+            f.write(table.tobytes())
+
+    def items(self):
+        for entry in self.entries:
+            yield int(entry["key"]), (int(entry["depth"]), float(entry["score"]), int(entry["move"]))
+
+def expand(board: Board, player: int, plies: int):
+    """Yields (board, player) for the position and every position up to plies moves after it"""
+    yield board, player
+    if plies == 0 or board.win() != -1:
+        return
+    for color in move_colors:
+        child = board.clone()
+        if child.move(color, player):
+            yield from expand(child, player ^ 1, plies - 1)
+
+def _search(args):
+    board, player, depth, time_limit = args
+    engine = Engine(board)
+    score, path = engine.search(player, depth, time_limit=time_limit)
+    if not path or engine.endgame_margin is not None:
+        return None
+    key, relabel = canonical(board, player)
+    return key, (engine.completed_depth, score, relabel[path[0]])
+
+def build(boards, plies: int = 2, depth: int = 12, time_limit: float = None, workers: int = 1, entries: dict = None):
+    """Searches every position within plies moves of the given (board, player) pairs and returns the
+    book entries, merged into `entries` if given"""
+    entries = {} if entries is None else entries
+    jobs = {}
+    for board, player in boards:
+        for position, side in expand(board, player, plies):
+            jobs.setdefault(canonical(position, side)[0], (position, side, depth, time_limit))
+    jobs = [job for key, job in jobs.items() if entries.get(key, (0,))[0] < depth]
+
+    if workers <= 1:
+        results = map(_search, jobs)
+    else:
+        pool = ProcessPoolExecutor(workers)
+        results = pool.map(_search, jobs)
+    for result in results:
+        if result is not None and result[1][0] > entries.get(result[0], (0,))[0]:
+            entries[result[0]] = result[1]
+    if workers > 1:
+        pool.shutdown()
+    return entries
+
+def main(argv=None):
+    from .analyze import read_positions
+    from .benchmark import position_board
+    parser = argparse.ArgumentParser(description="Build an opening book")
+    parser.add_argument("sources", nargs="*", help="JSON-lines positions, screenshots or directories of them to start from")
+    parser.add_argument("--random", type=int, default=0, help="also start from this many random boards")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plies", type=int, default=2, help="moves after each start position to cover")
+    parser.add_argument("--depth", type=int, default=12, help="search depth in plies per position")
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("-o", "--output", default="book.bin", help="book file, extended if it exists")
+    args = parser.parse_args(argv)
+
+    boards = []
+    for position in read_positions(args.sources):
+        if "error" in position:
+            print(f"{position['id']}: {position['error']}", file=sys.stderr)
+            continue
+        boards.append((position_board(position), position.get("player", len(position.get("moves", [])) % 2)))
+    state = random.getstate()
+    random.seed(args.seed)
+    boards += [(Board(), 0) for _ in range(args.random)]
+    random.setstate(state)
+
+    entries = dict(OpeningBook(args.output).items()) if Path(args.output).exists() else {}
+    before = len(entries)
+    build(boards, args.plies, args.depth, args.time, args.workers, entries)
+    OpeningBook.write(args.output, entries)
+    print(f"{args.output}: {len(entries)} positions ({len(entries) - before} new)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
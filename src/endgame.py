@@ -0,0 +1,105 @@
+from .board import Board
+from .tile import Colors
+from .transposition import EXACT, LOWER, UPPER
+
+def proven_score(margin: int) -> float:
+    """Maps a final tile margin onto the scale Board.eval uses for finished games"""
+    if margin == 0:
+        return 0
+    return float('inf') if margin > 0 else float('-inf')
+
+class EndgameSolver:
+    """Exact search once few tiles are left unowned.
+
+    Values are final tile margins (side to move minus opponent) under perfect play. A line that
+    returns to a position already on the search path makes no further progress, so it is scored
+    as the margin at that point. Solved positions are cached by ownership, player colors, side to
+    move and the colors of the unowned region, which makes entries valid across searches, moves
+    and boards."""
+
+    def __init__(self, threshold: int = 10, max_entries: int = 1 << 20):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.cache = {}
+        self.count = 0
+
+    def applies(self, board: Board) -> bool:
+        return (board.full & ~(board.owned[0] | board.owned[1])).bit_count() <= self.threshold
+
+    def region_key(self, board: Board, player: int):
+        free = board.full & ~(board.owned[0] | board.owned[1])
+        return (board.owned[0], board.owned[1], board.player_colors[0], board.player_colors[1], player,
+                tuple(mask & free for mask in board.color_masks))
+
+    def moves(self, board: Board, player: int) -> list[int]:
+        colors = [c for c in range(Colors.empty) if c not in board.player_colors]
+        colors.sort(key=lambda c: -board.capture_size(c, player))
+        return colors
+
+    def solve(self, board: Board, player: int) -> int:
+        limit = board.n * board.m + 1
+        return self.search(board, player, -limit, limit, set())
+
+    def outcome(self, board: Board, player: int) -> int:
+        """1, 0 or -1 for a win, draw or loss; a (-1, 1) window is much cheaper than the exact margin"""
+        value = self.search(board, player, -1, 1, set())
+        return (value > 0) - (value < 0)
+
+    def search(self, board: Board, player: int, alpha: int, beta: int, path: set) -> int:
+        self.count += 1
+        margin = board.tile_count(player) - board.tile_count(player ^ 1)
+        if (board.owned[0] | board.owned[1]) == board.full:
+            return margin
+        key = self.region_key(board, player)
+        if key in path:
+            return margin
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        alpha_orig = alpha
+        best = -(board.n * board.m + 1)
+        path.add(key)
+        for color in self.moves(board, player):
+            board.move(color, player)
+            value = -self.search(board, player ^ 1, -beta, -alpha, path)
+            board.undo_move()
+            if value > best:
+                best = value
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+        path.discard(key)
+
+        if len(self.cache) >= self.max_entries:
+            self.cache.clear()
+        self.cache[key] = (best, UPPER if best <= alpha_orig else LOWER if best >= beta else EXACT)
+        return best
+
+    def best_line(self, board: Board, player: int, length: int = 64) -> tuple[int, list[int]]:
+        """Final margin for player and a perfect-play line from the current position"""
+        nboard = board.clone()
+        margin = self.solve(nboard, player)
+        line = []
+        side = player
+        while len(line) < length and (nboard.owned[0] | nboard.owned[1]) != nboard.full:
+            target = self.solve(nboard, side)
+            for color in self.moves(nboard, side):
+                nboard.move(color, side)
+                if -self.solve(nboard, side ^ 1) == target:
+                    break
+                nboard.undo_move()
+            else:
+                break
+            line.append(color)
+            side ^= 1
+        return margin, line
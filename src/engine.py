@@ -1,134 +1,552 @@
 from types import FunctionType
-from .board import Board
+from .board import Board, default_weights
 from .tile import Colors
+from .transposition import TranspositionTable, EXACT, LOWER, UPPER
+from .endgame import EndgameSolver, proven_score
+from .telemetry import TimedBoard, timed, iteration_stats
+from contextlib import nullcontext
 import asyncio
+import math
+import threading
+import time
+
+move_colors = [c.value for c in Colors if c != Colors.empty] # int codes, search never touches the enum
+
+def to_colors(path: list[int]) -> list[Colors]:
+    return [Colors(color) for color in path]
+
+# attributes that change how an Engine searches, copied to ParallelEngine's workers
+search_settings = ("weights", "aspiration", "lmr", "lmr_moves", "futility", "dead_moves")
+
+class SearchCancelled(Exception):
+    """Raised inside a search once its stop flag is set"""
 
 class Engine:
-    def __init__(self, _board: Board):
+    def __init__(self, _board: Board, _tt: TranspositionTable = None, _endgame: EndgameSolver = None,
+                 book=None):
         self.board = _board
-        self.killer_moves = {}
-        self.principal_variation = {}
+        # copy of board taken when a search starts; the app moves the live board while searches run
+        self.position = None
+        self.book = book # OpeningBook consulted before searching, see known_result
+        self.tt = _tt if _tt is not None else TranspositionTable()
+        self.endgame = _endgame if _endgame is not None else EndgameSolver(8)
+        self.endgame_margin = None # final margin for the root player once the root is solved
+        self.killer_moves = [] # two most recent cutoff moves per ply
+        self.history = [[0] * len(move_colors) for _ in range(2)] # cutoff credit per player and color
+        self.principal_variation = [] # previous iteration's line, tried first while the search follows it
+        self.follow_pv = False
+        self.weights = default_weights # Board.eval weights; tables and results assume they stay fixed
+        self.aspiration = 1.0 # half-width of the root window around the previous score, 0 to disable
+        # selective search, off by default; see alphabeta_search, and measure with src.tournament
+        self.lmr = 0 # plies late moves are first searched shallower by, 0 to disable
+        self.lmr_moves = 3 # moves searched at full depth at a node before reductions start
+        self.futility = 0.0 # at depth 1, skip moves whose capture can't bring the static eval within this of the bound
+        self.dead_moves = None # "prune" or "reduce" moves that capture nothing and deny the opponent nothing
         self.count = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0 # cutoffs caused by the first move searched, a measure of move ordering
+        self.iterations = [] # telemetry.iteration_stats of each iteration completed by the last deepen()
+        self.phases = None # set to telemetry.new_phases() to time move generation, moves and evals
+        self.profiler = None # context manager entered around each deepen() on the search thread, e.g. cProfile.Profile()
+        self.abort = None # optional callable, checked alongside the stop flag
+        self.stop = threading.Event()
+        self.lock = threading.Lock() # one search at a time per engine
+        self.node_limit = None
+        self.deadline = None
+        self.completed_depth = 0
+        # board key and side to move -> (depth, eval, path, endgame margin) of the deepest search
+        # finished from that position, by search() or ponder(), kept across moves and undos
+        self.results = {}
+        self.max_results = 1 << 12
+        # per-ply buffers reused by every node, see ensure_ply
+        self.pv_table = []
+        self.pv_length = []
+        self.move_buffer = []
+        self.order_buffer = []
+        self.ensure_ply(64)
 
-    def get_children(self, cur_board: Board, player: int, depth: int):
-        children = []
-        for color in Colors:
-            if color == Colors.empty or color in cur_board.player_colors:
-                continue
-            before = len(cur_board.player_tiles[player])
-            if not cur_board.move(color, player):
+    def tt_store(self, cur_board: Board, player: int, root: int, depth: int,
+                 score: float, alpha: float, beta: float, move):
+        """Scores are kept from player 0's point of view so entries survive a change of root"""
+        flag = UPPER if score <= alpha else LOWER if score >= beta else EXACT
+        if root:
+            score = -score
+            flag = UPPER if flag == LOWER else LOWER if flag == UPPER else EXACT
+        self.tt.store(cur_board.key(player), depth, score, flag, move)
+
+    def tt_score(self, entry, root: int):
+        _, _, score, flag, _, _ = entry
+        if root:
+            score = -score
+            flag = UPPER if flag == LOWER else LOWER if flag == UPPER else EXACT
+        return score, flag
+
+    def root(self) -> Board:
+        """Position being searched: the snapshot deepen() or ponder() took, else the board itself"""
+        return self.position if self.position is not None else self.board
+
+    def extend_pv(self, player: int, path: list[int], depth: int) -> list[int]:
+        """Fill in a line cut short by table hits by following stored best moves"""
+        nboard = self.root().clone()
+        for color in path:
+            nboard.move(color, player)
+            player ^= 1
+        path = list(path)
+        while len(path) < depth and nboard.win() == -1:
+            entry = self.tt.probe(nboard.key(player))
+            if entry is None or entry[4] is None or not nboard.move(entry[4], player):
+                break
+            path.append(entry[4])
+            player ^= 1
+        return path
+
+    def ensure_ply(self, plies: int):
+        """Grows the per-ply buffers so a search can reach ply `plies`"""
+        size = len(self.pv_length)
+        if plies < size:
+            return
+        size = max(plies + 1, size * 2)
+        self.pv_table = [[None] * size for _ in range(size)]
+        self.pv_length = [0] * size
+        self.move_buffer += [[None] * len(move_colors) for _ in range(size - len(self.move_buffer))]
+        self.order_buffer += [[0] * len(move_colors) for _ in range(size - len(self.order_buffer))]
+        self.killer_moves += [[None, None] for _ in range(size - len(self.killer_moves))]
+
+    def clear_killers(self):
+        for killers in self.killer_moves:
+            killers[0] = killers[1] = None
+
+    def age_history(self):
+        for row in self.history:
+            for i in range(len(row)):
+                row[i] >>= 1
+
+    def pv_line(self, ply: int) -> list[int]:
+        return self.pv_table[ply][ply:self.pv_length[ply]]
+
+    def get_children(self, cur_board: Board, player: int, ply: int, tt_move=None) -> int:
+        """Fills move_buffer[ply] with legal colors in search order and returns how many there are.
+
+        Order is the previous iteration's PV move while the search is still following that line,
+        the table move, this ply's killers, then larger captures and higher history scores first."""
+        moves = self.move_buffer[ply]
+        order = self.order_buffer[ply]
+        pv = None
+        if self.follow_pv:
+            pv = self.principal_variation[ply] if ply < len(self.principal_variation) else None
+            self.follow_pv = pv is not None and pv not in cur_board.player_colors
+        k0, k1 = self.killer_moves[ply]
+        history = self.history[player]
+        c0, c1 = cur_board.player_colors
+        count = 0
+        for color in move_colors:
+            if color == c0 or color == c1:
                 continue
-            after = len(cur_board.player_tiles[player])
-            delta = after - before
-            children.append((color, delta))
-            cur_board.undo_move()
+            rank = 0 if color == pv else 1 if color == tt_move else 2 if color == k0 or color == k1 else 3
+            key = (rank << 24) - (cur_board.capture_size(color, player) << 16) - min(history[color], 0xFFFF)
+            # insertion sort; there are at most five legal colors
+            k = count
+            while k and order[k - 1] > key:
+                order[k] = order[k - 1]
+                moves[k] = moves[k - 1]
+                k -= 1
+            order[k] = key
+            moves[k] = color
+            count += 1
+        return count
 
-        pv = self.principal_variation.get(depth, -1)
-        children.sort(key=lambda x: (0 if pv == x[0] else 1 if x[0] in self.killer_moves.get(depth, []) else 2, -x[1]))
-        return [color for color, _ in children]
+    def pvs_child(self, cur_board: Board, depth: int, alpha: float, beta: float, player: int,
+                  ply: int, root: int, first: bool, maximizing: bool, reduction: int = 0) -> float:
+        """Principal variation search: siblings after the first get a zero-width window just past the
+        current bound, and are only searched again with the full window if they beat it. A reduced
+        sibling gets that zero-width search `reduction` plies shallower first, and only continues
+        at full depth if the shallow search beats the bound."""
+        if first:
+            return self.alphabeta_search(cur_board, depth, alpha, beta, player, ply, root)
+        if reduction:
+            if maximizing:
+                eval = self.alphabeta_search(cur_board, depth - reduction, alpha, math.nextafter(alpha, math.inf), player, ply, root)
+                if eval <= alpha:
+                    return eval
+            else:
+                eval = self.alphabeta_search(cur_board, depth - reduction, math.nextafter(beta, -math.inf), beta, player, ply, root)
+                if eval >= beta:
+                    return eval
+        if maximizing:
+            eval = self.alphabeta_search(cur_board, depth, alpha, math.nextafter(alpha, math.inf), player, ply, root)
+        else:
+            eval = self.alphabeta_search(cur_board, depth, math.nextafter(beta, -math.inf), beta, player, ply, root)
+        if alpha < eval < beta:
+            eval = self.alphabeta_search(cur_board, depth, alpha, beta, player, ply, root)
+        return eval
 
+    def alphabeta_search(self, cur_board: Board, depth: int, alpha: float, beta: float,
+                  player: int, ply: int, root: int) -> float:
+        """Minimax score for root; the line found is left in pv_table[ply].
 
-    async def alphabeta_search(self, cur_board: Board, depth: int, alpha: float, beta: float,
-                  player: int, path: list[Colors], root: int) -> tuple[float, list[Colors]]:
-        if depth == 0 or cur_board.win() != -1:
-            eval = cur_board.eval(root)
-            return eval, path[:]
+        Past the first move, selective search may skip or shorten moves: near the horizon a move
+        whose capture can't bring the static eval within `futility` of the bound is skipped, moves
+        that capture nothing and take no color on the opponent's frontier are pruned or reduced a
+        ply (`dead_moves`), and moves from the `lmr_moves`th on are reduced by `lmr` plies."""
+        self.pv_length[ply] = ply
+        if cur_board.win() != -1:
+            return cur_board.eval(root, self.weights)
+        if self.endgame is not None and self.endgame.applies(cur_board):
+            outcome = self.endgame.outcome(cur_board, player)
+            return proven_score(outcome if player == root else -outcome)
+        if depth == 0:
+            return cur_board.eval(root, self.weights)
 
         self.count += 1
         if (self.count % 100 == 0):
-            await asyncio.sleep(0)
-            if (asyncio.current_task().cancelled()):
-                raise asyncio.CancelledError()
-
-        if player == root:
-            max_eval = float('-inf')
-            best_path = []
-            for color in self.get_children(cur_board, player, depth):
-                if not cur_board.move(color, player):
-                    continue
-                path.append(color)
-                eval, result_path = await self.alphabeta_search(cur_board, depth - 1, alpha, beta, player ^ 1, path, root)
-                path.pop()
-                cur_board.undo_move()
-
-                if eval > max_eval:
-                    max_eval = eval
-                    best_path = result_path[:]
-
-                alpha = max(alpha, max_eval)
-                if beta <= alpha:
-                    self.killer_moves.setdefault(depth, [])
-                    if color not in self.killer_moves[depth]:
-                        self.killer_moves[depth].append(color)
-                        if len(self.killer_moves[depth]) > 2:
-                            self.killer_moves[depth].pop(0)
-                    break
-            return max_eval, best_path
-        else:
-            min_eval = float('inf')
-            best_path = []
-            for color in self.get_children(cur_board, player, depth):
-                if not cur_board.move(color, player):
-                    continue
-                path.append(color)
-                eval, result_path = await self.alphabeta_search(cur_board, depth - 1, alpha, beta, player ^ 1, path, root)
-                path.pop()
-                cur_board.undo_move()
-
-                if eval < min_eval:
-                    min_eval = eval
-                    best_path = result_path[:]
-
-                beta = min(beta, min_eval)
+            if (self.stop.is_set() or (self.abort is not None and self.abort())):
+                raise SearchCancelled()
+            if ((self.node_limit is not None and self.count >= self.node_limit)
+                or (self.deadline is not None and time.monotonic() > self.deadline)):
+                raise TimeoutError()
+
+        alpha_orig, beta_orig = alpha, beta
+        entry = self.tt.probe(cur_board.key(player))
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score, flag = self.tt_score(entry, root)
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
                 if beta <= alpha:
-                    self.killer_moves.setdefault(depth, [])
-                    if color not in self.killer_moves[depth]:
-                        self.killer_moves[depth].append(color)
-                        if len(self.killer_moves[depth]) > 2:
-                            self.killer_moves[depth].pop(0)
-                    break
-            return min_eval, best_path
-
-    async def get_moves(self, player: int, depth: int, clear_killers=True, clear_pv=True):
-        nboard = self.board.clone()
+                    return score
+
+        maximizing = player == root
+        best_eval = float('-inf') if maximizing else float('inf')
+        best_move = None
+        moves = self.move_buffer[ply]
+        line = self.pv_table[ply]
+        child_line = self.pv_table[ply + 1]
+        static = cur_board.eval(root, self.weights) if self.futility and depth == 1 else None
+        denied = cur_board.frontiers[player ^ 1]
+        for i in range(self.get_children(cur_board, player, ply, tt_move)):
+            color = moves[i]
+            reduction = 0
+            if i:
+                capture = cur_board.capture_size(color, player)
+                if static is not None:
+                    gain = capture * self.weights[0] + self.futility
+                    if (static + gain <= alpha) if maximizing else (static - gain >= beta):
+                        continue
+                if self.dead_moves is not None and not capture and not denied & cur_board.color_masks[color]:
+                    if self.dead_moves == "prune":
+                        continue
+                    reduction = 1
+                if self.lmr and i >= self.lmr_moves:
+                    reduction = max(reduction, self.lmr)
+                reduction = min(reduction, depth - 1)
+            if not cur_board.move(color, player):
+                continue
+            eval = self.pvs_child(cur_board, depth - 1, alpha, beta, player ^ 1, ply + 1, root, i == 0, maximizing, reduction)
+            cur_board.undo_move()
+
+            if (eval > best_eval) if maximizing else (eval < best_eval):
+                best_eval = eval
+                best_move = color
+                line[ply] = color
+                end = self.pv_length[ply + 1]
+                for k in range(ply + 1, end):
+                    line[k] = child_line[k]
+                self.pv_length[ply] = max(end, ply + 1)
+
+            if maximizing:
+                alpha = max(alpha, best_eval)
+            else:
+                beta = min(beta, best_eval)
+            if beta <= alpha:
+                self.cutoffs += 1
+                self.first_cutoffs += i == 0
+                killers = self.killer_moves[ply]
+                if killers[0] != color:
+                    killers[1] = killers[0]
+                    killers[0] = color
+                self.history[player][color] += depth * depth
+                break
+        self.tt_store(cur_board, player, root, depth, best_eval, alpha_orig, beta_orig, best_move)
+        return best_eval
+
+    def get_moves(self, player: int, depth: int, clear_killers=True, clear_pv=True,
+                  alpha: float = float('-inf'), beta: float = float('inf')):
+        nboard = self.root().clone()
+        if self.phases is not None:
+            nboard = TimedBoard.wrap(nboard, self.phases)
         best_eval = float('-inf')
         best_path = []
         if clear_killers:
-            self.killer_moves.clear()
+            self.clear_killers()
         if clear_pv:
-            self.principal_variation.clear()
+            self.principal_variation = []
+        self.follow_pv = True
+
+        self.endgame_margin = None
+        if self.endgame is not None and self.endgame.applies(nboard) and nboard.win() == -1:
+            self.endgame_margin, line = self.endgame.best_line(nboard, player)
+            return proven_score(self.endgame_margin), line
 
-        for color in self.get_children(nboard, player, depth):
+        self.ensure_ply(depth + 1)
+        alpha_orig = alpha
+        entry = self.tt.probe(nboard.key(player))
+        count = self.get_children(nboard, player, 0, entry[4] if entry is not None else None)
+        for i, color in enumerate(self.move_buffer[0][:count]):
             if not nboard.move(color, player):
                 continue
-            path = [color]
-            eval_score, res_path = await self.alphabeta_search(nboard, depth - 1, float('-inf'), float('inf'), player ^ 1, path, player)
+            eval_score = self.pvs_child(nboard, depth - 1, alpha, beta, player ^ 1, 1, player, i == 0, True)
             nboard.undo_move()
-            if eval_score > best_eval:
+            if eval_score > best_eval or not best_path:
                 best_eval = eval_score
-                best_path = res_path
+                best_path = [color] + self.pv_line(1)
+            alpha = max(alpha, best_eval)
+            if beta <= alpha:
+                break
 
+        if best_path:
+            self.tt_store(nboard, player, player, depth, best_eval, alpha_orig, beta, best_path[0])
+            best_path = self.extend_pv(player, best_path, depth)
         return best_eval, best_path
 
-    async def IDDFS(self, player: int, depth: int, callback=None):
+    def aspirate(self, player: int, depth: int, guess: float):
+        """get_moves inside a window around guess, widening whichever side the score falls outside of"""
+        if not self.aspiration or not math.isfinite(guess):
+            return self.get_moves(player, depth, False, False)
+        alpha, beta = guess - self.aspiration, guess + self.aspiration
+        while True:
+            eval, path = self.get_moves(player, depth, False, False, alpha, beta)
+            if eval <= alpha and alpha != float('-inf'):
+                alpha = float('-inf')
+            elif eval >= beta and beta != float('inf'):
+                beta = float('inf')
+            else:
+                return eval, path
+
+    def settings(self) -> dict:
+        return {name: getattr(self, name) for name in search_settings}
+
+    def record(self, player: int, depth: int, eval: float, path: list[int]):
+        if len(self.results) >= self.max_results:
+            self.results.clear()
+        self.results[self.root().key(player)] = (depth, eval, path, self.endgame_margin)
+
+    def known_result(self, player: int):
+        """Deepest finished result for the current position as (depth, eval, path, endgame margin), or None.
+
+        Besides earlier searches from this position, an exact table entry left by a search that
+        passed through it counts, as long as it covers a whole number of moves for both sides,
+        and so does an opening book entry."""
+        board = self.root()
+        key = board.key(player)
+        known = self.results.get(key)
+        if self.endgame is not None and self.endgame.applies(board):
+            return known
+        if self.book is not None:
+            entry = self.book.probe(board, player)
+            if entry is not None and (known is None or entry[0] > known[0]):
+                depth, eval, _ = entry
+                known = depth, eval, self.book.line(board, player, depth), None
+        entry = self.tt.probe(key)
+        if (entry is not None and entry[3] == EXACT and entry[4] is not None and entry[1] >= 2
+                and entry[1] % 2 == 0 and (known is None or entry[1] > known[0])):
+            eval, _ = self.tt_score(entry, player)
+            return entry[1], eval, self.extend_pv(player, [entry[4]], entry[1]), None
+        return known
+
+    def close(self):
+        pass
+
+    def search(self, player: int, depth: int, callback=None, time_limit: float = None, node_limit: int = None,
+               stop: threading.Event = None, stats=None, position: Board = None):
+        """Deepens two plies at a time up to depth, or until time_limit seconds / node_limit nodes run out.
+
+        An iteration is only started if the growth in node count between the last two iterations
+        predicts it will finish inside the budget; one that overruns anyway is abandoned. Setting
+        `stop` from another thread ends the search at its next check. `stats` is called with the
+        telemetry.iteration_stats of each completed iteration, before callback gets its line.
+        `position` is the board to search, by default a copy of the engine's board taken when the
+        search starts; callers moving the board from another thread should copy it themselves.
+        Returns the eval and line of the deepest completed iteration; lines are given as Colors."""
+        if callback is not None:
+            report = callback
+            callback = lambda path, eval: report(to_colors(path), eval)
+        eval, path = self.deepen(player, depth, callback, time_limit, node_limit, stop, stats, position)
+        return eval, to_colors(path)
+
+    def deepen(self, player: int, depth: int, callback=None, time_limit: float = None, node_limit: int = None,
+               stop: threading.Event = None, stats=None, position: Board = None):
+        """search() with lines left as int color codes"""
         eval = 0
         path = []
         funny_count = 0
-        for d in range(2, depth + 1, 2):
+        with self.lock, self.profiler if self.profiler is not None else nullcontext():
+            self.stop = stop if stop is not None else threading.Event()
+            if self.stop.is_set():
+                return eval, path
+            self.position = position if position is not None else self.board.clone()
+            self.tt.new_search()
+            self.iterations = []
+            if self.phases is not None:
+                self.get_children = timed(self.get_children, self.phases, "movegen")
+            self.age_history()
+            self.clear_killers()
+            self.principal_variation = []
+            self.completed_depth = 0
+            start = time.monotonic()
+            start_count = self.count
+            self.node_limit = None if node_limit is None else start_count + node_limit
+            self.deadline = None if time_limit is None else start + time_limit
+            last_time = last_nodes = growth = None
+            first = 2
             try:
-                eval, path = await self.get_moves(player, d, d == 1, d == 1)
-            except asyncio.CancelledError:
-                return
-            if path:
-                self.principal_variation[d] = path[0]
-            if (eval == float('inf') or eval == float('-inf')):
-                if funny_count:
-                    break
-                else:
-                    funny_count += 1
-            if callback is not None:
-                callback(path, eval)
+                known = self.known_result(player)
+                if known is not None:
+                    # this position was searched before, carry on from where that search got to
+                    self.completed_depth, eval, path, self.endgame_margin = known
+                    self.principal_variation = path
+                    first = self.completed_depth + 2
+                    if callback is not None:
+                        callback(path, eval)
+                    if first > depth or self.endgame_margin is not None or math.isinf(eval):
+                        return eval, path
+                for d in range(first, depth + 1, 2):
+                    # shallow iterations can finish between the node-count checks, look here as well
+                    if self.stop.is_set() or (self.abort is not None and self.abort()):
+                        break
+                    elapsed = time.monotonic() - start
+                    if growth is not None:
+                        if time_limit is not None and elapsed + last_time * growth > time_limit:
+                            break
+                        if node_limit is not None and self.count - start_count + last_nodes * growth > node_limit:
+                            break
+
+                    iter_start = time.monotonic()
+                    iter_count = self.count
+                    iter_cutoffs, iter_first = self.cutoffs, self.first_cutoffs
+                    iter_probes, iter_hits = self.tt.probes, self.tt.hits
+                    iter_phases = dict(self.phases) if self.phases is not None else None
+                    try:
+                        eval, path = self.aspirate(player, d, eval if path else float('nan'))
+                    except (SearchCancelled, TimeoutError):
+                        break
+                    self.completed_depth = d
+                    self.record(player, d, eval, path)
+
+                    nodes = max(1, self.count - iter_count)
+                    if last_nodes is not None:
+                        growth = max(1.0, nodes / last_nodes)
+                    last_nodes = nodes
+                    last_time = time.monotonic() - iter_start
+                    self.iterations.append(iteration_stats(
+                        d, self.count - iter_count, self.cutoffs - iter_cutoffs, self.first_cutoffs - iter_first,
+                        self.tt.probes - iter_probes, self.tt.hits - iter_hits, last_time, time.monotonic() - start,
+                        None if iter_phases is None else {k: v - iter_phases[k] for k, v in self.phases.items()}))
+                    if stats is not None:
+                        stats(self.iterations[-1])
+
+                    self.principal_variation = path
+                    if self.endgame_margin is not None:
+                        if callback is not None:
+                            callback(path, eval)
+                        break
+                    if (eval == float('inf') or eval == float('-inf')):
+                        if funny_count:
+                            break
+                        else:
+                            funny_count += 1
+                    if callback is not None:
+                        callback(path, eval)
+            finally:
+                self.node_limit = None
+                self.deadline = None
+                self.position = None
+                self.__dict__.pop("get_children", None)
+        return eval, path
 
-            await asyncio.sleep(0)
-            if (asyncio.current_task().cancelled()):
+    def ponder(self, player: int, depth: int, stop: threading.Event = None, position: Board = None):
+        """Searches the positions after each move player could make, while waiting for the move.
+
+        Replies are deepened two plies at a time in turn, starting with the predicted one (the first
+        move of the last line found). Results are recorded like search()'s, so search() starts from
+        them when the move is actually played. Runs until every reply reaches depth or `stop` is set.
+        `position` is the board to ponder from, as for search()."""
+        with self.lock:
+            self.stop = stop if stop is not None else threading.Event()
+            root = position if position is not None else self.board.clone()
+            if root.win() != -1:
                 return
+            line = self.principal_variation
+            predicted = line[0] if line else None
+            replies = []
+            for color in sorted(move_colors, key=lambda c: (c != predicted, -root.capture_size(c, player))):
+                child = root.clone()
+                if child.move(color, player):
+                    replies.append((child, line[1:] if color == predicted else []))
+
+            self.tt.new_search()
+            margin = self.endgame_margin
+            try:
+                for d in range(2, depth + 1, 2):
+                    for child, child_line in replies:
+                        if self.stop.is_set():
+                            return
+                        self.position = child
+                        known = self.known_result(player ^ 1)
+                        if known is not None and (known[0] >= d or known[3] is not None or math.isinf(known[1])):
+                            continue
+                        self.principal_variation = known[2] if known is not None else child_line
+                        try:
+                            eval, path = self.aspirate(player ^ 1, d, known[1] if known is not None else float('nan'))
+                        except (SearchCancelled, TimeoutError):
+                            return
+                        self.record(player ^ 1, d, eval, path)
+            finally:
+                self.position = None
+                self.principal_variation = line
+                self.endgame_margin = margin
+
+    async def IDDFS(self, player: int, depth: int, callback=None, time_limit: float = None, node_limit: int = None,
+                    stats=None):
+        """Runs search() on a worker thread so the event loop stays free.
+
+        callback and stats are delivered on the calling loop. Cancelling the awaiting task stops the search.
+        The board is copied here, on the loop's thread, so moves made on it later can't be half-seen."""
+        position = self.board.clone()
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        stop = threading.Event()
+        report = None
+        if callback is not None:
+            def deliver(path, eval):
+                if not task.done():
+                    callback(path, eval)
+            report = lambda path, eval: loop.call_soon_threadsafe(deliver, path, eval)
+        report_stats = None
+        if stats is not None:
+            def deliver_stats(entry):
+                if not task.done():
+                    stats(entry)
+            report_stats = lambda entry: loop.call_soon_threadsafe(deliver_stats, entry)
+        try:
+            return await asyncio.to_thread(self.search, player, depth, report, time_limit, node_limit, stop,
+                                           report_stats, position)
+        except asyncio.CancelledError:
+            stop.set()
+            raise
+
+    async def ponder_in_background(self, player: int, depth: int):
+        """Runs ponder() on a worker thread, from a copy of the board taken on the loop's thread.
+        Cancelling the awaiting task stops it."""
+        position = self.board.clone()
+        stop = threading.Event()
+        try:
+            await asyncio.to_thread(self.ponder, player, depth, stop, position)
+        except asyncio.CancelledError:
+            stop.set()
+            raise
@@ -1,16 +1,34 @@
 from pathlib import Path
+import time
 from textual.app import App
 from textual.widgets import DirectoryTree, Footer, Static 
 from textual.widget import Widget
 from textual.reactive import var
 from textual.message import Message
-from rich.panel import Panel
-from rich.columns import Columns
-from rich.console import Group
 from .board import Board
 from .tile import Colors
 from .engine import Engine
-from .griddetection import GridDetection
+from .parallel import ParallelEngine
+from .book import OpeningBook
+from .records import GameArchive, append, game_record, restore
+from .telemetry import format_stats
+from .griddetection import GridDetection, default_palette_cache
+
+class Cell(Widget):
+    """One tile of the board; only repainted when its displayed color changes"""
+
+    def __init__(self):
+        super().__init__()
+        self.color = None
+
+    def paint(self, color: str):
+        if color != self.color:
+            self.color = color
+            self.styles.background = color
+            self.styles.border = ("round", color)
+
+    def render(self):
+        return ""
 
 class Grid(Widget):
     n = 7
@@ -28,19 +46,40 @@ class Grid(Widget):
         super().__init__()
         self.board = _board
         self.styles.height = 36
-       
-    def render(self):
-        columns = []
-        for i in range(self.n):
-            row = []
-            for j in range(self.m):
-                color = Colors(self.board.board[i][j].color).name
-                owner = self.board.board[i][j].owner
-                if (owner != -1):
-                    color = Colors(self.board.player_colors[owner]).name
-                row.append(Panel("  ", style=f"on {self.hex_colors[color]}", padding=(1, 2), expand=True, border_style=color))
-            columns.append(Columns(row, expand=True))
-        return Group(*columns)
+        self.styles.layout = "grid"
+        self.styles.grid_size_columns = self.m
+        self.styles.grid_size_rows = self.n
+        self.cells = [Cell() for _ in range(self.n * self.m)]
+        self.shown = None # (owned, player_colors) last painted, see sync
+
+    def compose(self):
+        yield from self.cells
+
+    def on_mount(self):
+        self.sync()
+
+    def sync(self):
+        """Repaints the cells whose owner or owner's color changed since the last sync"""
+        board = self.board
+        state = (tuple(board.owned), tuple(board.player_colors))
+        if self.shown is None:
+            changed = board.full
+        else:
+            owned, colors = self.shown
+            changed = (owned[0] ^ board.owned[0]) | (owned[1] ^ board.owned[1])
+            for player in range(2):
+                if colors[player] != board.player_colors[player]:
+                    changed |= owned[player] | board.owned[player]
+        self.shown = state
+        while changed:
+            low = changed & -changed
+            i, j = divmod(low.bit_length() - 1, self.m)
+            color = board.color_at(i, j)
+            owner = board.owner_at(i, j)
+            if owner != -1:
+                color = board.player_colors[owner]
+            self.cells[i * self.m + j].paint(self.hex_colors[Colors(color).name])
+            changed ^= low
 
 class EngineWidget(Static):
     engine_line = var([])
@@ -53,49 +92,95 @@ class EngineWidget(Static):
             "black": "#414141",
             "yellow": "#fae251"
             }
+    min_interval = 0.1 # seconds between redraws; search updates arriving faster are merged
 
-    def __init__(self, _engine: Engine):
+    def __init__(self, _engine: Engine, max_depth: int = 10, time_limit: float = None, ponder: bool = True):
         super().__init__()
         self.engine = _engine
-        self.max_depth = 10
+        self.board = _engine.board
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.ponder = ponder
+        self.endgame_margin = None
+        self.stats = None # telemetry.iteration_stats of the latest iteration
         self.parity = 0
+        self.text = None # markup currently shown
+        self.line_text = None # (line, markup) of the last continuation rendered
+        self.last_draw = 0.0
+        self.pending = None # timer of the next scheduled redraw
         # self.styles.height = 3
         # self.styles.dock = "bottom"
 
     def set_parity(self, parity):
         self.parity = parity
+        self.schedule_draw()
 
     async def on_mount(self):
         self.engine_line = []
-        self.run_worker(self.engine.IDDFS(self.parity, self.max_depth, self.update_move), exclusive=True)
+        self.draw()
+        self.run_worker(self.start_search(), exclusive=True)
     
     def update_move(self, nline, neval):
         self.engine_line = list(nline)
         self.engine_eval = neval
-        self.refresh()
+        self.endgame_margin = self.engine.endgame_margin
+        self.schedule_draw()
 
-    def start_search(self):
-        return self.engine.IDDFS(self.parity, self.max_depth, self.update_move)
+    def update_stats(self, stats):
+        self.stats = stats
+        self.schedule_draw()
 
-    def render(self):
-        p1_color = Colors(self.engine.board.player_colors[0]).name
-        p2_color = Colors(self.engine.board.player_colors[1]).name
+    def schedule_draw(self):
+        """Redraws now if the last redraw was long enough ago, otherwise once the interval is up"""
+        if self.pending is not None:
+            return
+        wait = self.last_draw + self.min_interval - time.monotonic()
+        if wait <= 0 or not self.is_mounted:
+            self.draw()
+        else:
+            self.pending = self.set_timer(wait, self.draw)
+
+    def draw(self):
+        self.pending = None
+        self.last_draw = time.monotonic()
+        text = self.markup()
+        if text != self.text:
+            self.text = text
+            self.update(text)
+
+    async def start_search(self):
+        """Analyses the position, then ponders the replies until the next move cancels the worker"""
+        self.stats = None
+        await self.engine.IDDFS(self.parity, self.max_depth, self.update_move, self.time_limit, stats=self.update_stats)
+        if self.ponder:
+            await self.engine.ponder_in_background(self.parity, self.max_depth)
 
-        p1 = f"[{self.hex_colors[p1_color]}]{len(self.engine.board.player_tiles[0])}"
-        p2 = f"[{self.hex_colors[p2_color]}]{len(self.engine.board.player_tiles[1])}"
+    def markup(self) -> str:
+        p1_color = Colors(self.board.player_colors[0]).name
+        p2_color = Colors(self.board.player_colors[1]).name
+
+        p1 = f"[{self.hex_colors[p1_color]}]{self.board.tile_count(0)}"
+        p2 = f"[{self.hex_colors[p2_color]}]{self.board.tile_count(1)}"
         
         tile_counts = f"{p1} - {p2}\n"
 
         if not self.engine_line:
             best_line = "Best continuation: (thinking...)"
         else:
-            line = ' → '.join(
-                f"[{self.hex_colors[color.name]}]{color.name}"
-                for color in self.engine_line
-            )
-            best_line = f"Best continuation: {line}"
+            if self.line_text is None or self.line_text[0] != self.engine_line:
+                line = ' → '.join(
+                    f"[{self.hex_colors[color.name]}]{color.name}"
+                    for color in self.engine_line
+                )
+                self.line_text = self.engine_line, line
+            best_line = f"Best continuation: {self.line_text[1]}"
 
-        return f"{tile_counts}{best_line}[/]\nEngine evaluation: {self.engine_eval}"
+        evaluation = f"Engine evaluation: {self.engine_eval}"
+        if self.endgame_margin is not None:
+            evaluation += f" (solved, final margin {self.endgame_margin:+d})"
+        if self.stats is not None:
+            evaluation += f"\n[dim]{format_stats(self.stats)}[/]"
+        return f"{tile_counts}{best_line}[/]\n{evaluation}"
 
 class FileSelected(Message):
     def __init__(self, path):
@@ -104,28 +189,36 @@ class FileSelected(Message):
 
 class FilePickerWidget(DirectoryTree):
     image_extensions = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp", ".heic", ".heif", ".ico", ".psd", ".svg", ".eps", ".ai", ".pdf"]
+    record_extensions = [".frec"]
 
     def filter_paths(self, paths):
         return [
             path for path in paths
             if not path.name.startswith(".") and (
-                Path(path).is_dir() or Path(path).suffix.lower() in self.image_extensions
+                Path(path).is_dir() or Path(path).suffix.lower() in self.image_extensions + self.record_extensions
             )
         ]
 
     def on_tree_node_selected(self, event: DirectoryTree.NodeSelected) -> None:
         path = event.node.data.path
-        if Path(path).is_file() and Path(path).suffix.lower() in self.image_extensions:
+        if Path(path).is_file() and Path(path).suffix.lower() in self.image_extensions + self.record_extensions:
             self.post_message(FileSelected(Path(path)))
 
 class FillerApp(App):
-    def __init__(self, driver_class=None, css_path=None, watch_css=False, ansi_color=False):
+    def __init__(self, driver_class=None, css_path=None, watch_css=False, ansi_color=False, workers=1,
+                 max_depth=10, time_limit=None, ponder=True, book=None, records="games.frec"):
         super().__init__(driver_class, css_path, watch_css, ansi_color)
+        self.search_workers = workers
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.ponder = ponder
+        self.book = OpeningBook(book) if book is not None else None
+        self.records = Path(records) # game archive the current game is saved to
         self.board = Board()
         self.grid = Grid(self.board)
-        self.engine = Engine(self.board)
-        self.engine_display = EngineWidget(self.engine)
-        self.detector = GridDetection()
+        self.engine = self.new_engine(self.board)
+        self.engine_display = EngineWidget(self.engine, self.max_depth, self.time_limit, self.ponder)
+        self.detector = GridDetection(default_palette_cache)
         self.parity = 0
         self.file_picker = None
         self.selected_file = None
@@ -140,6 +233,7 @@ class FillerApp(App):
         ("7", "make_move(-1)", "Engine Move"),
         ("0", "pass", "Pass"),
         ("i", "import_board", "Import Board"),
+        ("s", "save_game", "Save Game"),
         ("u", "undo()", "Undo"),
         ("r", "make_move(0)"),
         ("g", "make_move(1)"),
@@ -150,6 +244,16 @@ class FillerApp(App):
         ("e", "make_move(-1)")
     ]
 
+    def new_engine(self, board: Board) -> Engine:
+        """Search runs in-process with one worker, otherwise helper processes share its table (Lazy SMP)"""
+        if self.search_workers > 1:
+            return ParallelEngine(board, self.search_workers, book=self.book)
+        return Engine(board, book=self.book)
+
+    def on_unmount(self):
+        self.workers.cancel_group(self, "default")
+        self.engine.close()
+
     async def action_import_board(self):
         if self.file_picker:
             await self.file_picker.remove()
@@ -163,59 +267,86 @@ class FillerApp(App):
         if self.file_picker:
             await self.file_picker.remove()
             self.file_picker = None
-        self.detector.process(self.selected_file)
+        if self.selected_file.suffix.lower() in FilePickerWidget.record_extensions:
+            await self.load_game(self.selected_file)
+            self.selected_file = None
+            return
+        try:
+            self.detector.process(self.selected_file)
+        except ValueError as e:
+            # a wrong board is worse than none, keep the current one and let the user retake the shot
+            self.notify(f"{self.selected_file.name}: {e}", title="Import failed", severity="error")
+            self.selected_file = None
+            return
         print(self.selected_file)
         print(self.detector.get_board())
-        self.board = Board(self.detector.get_board())
+        await self.show_board(Board(self.detector.get_board()), 0)
+        self.selected_file = None
+
+    async def load_game(self, path: Path):
+        """Continues the last game in the archive at path, with its moves on the undo stack"""
+        try:
+            archive = GameArchive(path)
+            if not len(archive):
+                raise ValueError("no games in archive")
+            grid, moves = archive[len(archive) - 1]
+            archive.close()
+            board = restore(grid, moves)
+        except (OSError, ValueError) as e:
+            self.notify(f"{path.name}: {e}", title="Load failed", severity="error")
+            return
+        await self.show_board(board, moves[-1][0] ^ 1 if moves else 0)
+
+    def action_save_game(self):
+        try:
+            append(self.records, [game_record(self.board)])
+        except OSError as e:
+            self.notify(f"{self.records}: {e}", title="Save failed", severity="error")
+            return
+        self.notify(f"Saved to {self.records}")
+
+    async def show_board(self, board: Board, parity: int):
+        """Replaces the board on screen and the engine analysing it"""
+        self.board = board
 
         await self.grid.remove()
         await self.engine_display.remove()
 
         self.grid = Grid(self.board)
-        self.engine = Engine(self.board)
-        self.engine_display = EngineWidget(self.engine)
+        # the old engine's search must be over before close() frees what it searches with
+        self.workers.cancel_group(self, "default")
+        self.engine.close()
+        self.engine = self.new_engine(self.board)
+        self.engine_display = EngineWidget(self.engine, self.max_depth, self.time_limit, self.ponder)
 
-        self.parity = 0
+        self.parity = parity
+        self.engine_display.set_parity(parity)
         await self.mount(self.grid)
         await self.mount(self.engine_display)
 
-        self.run_worker(
-            self.engine_display.engine.IDDFS(self.parity, self.engine_display.max_depth, self.engine_display.update_move),
-            exclusive=True
-        )
-
-        self.selected_file = None
+        self.run_worker(self.engine_display.start_search(), exclusive=True)
 
 
     def action_pass(self):
         self.parity ^= 1
         self.engine_display.set_parity(self.parity)
-        self.run_worker(
-            self.engine_display.engine.IDDFS(self.parity, self.engine_display.max_depth, self.engine_display.update_move),
-            exclusive=True
-        )
+        self.run_worker(self.engine_display.start_search(), exclusive=True)
 
     def action_make_move(self, color: int):
         if (color == -1 and len(self.engine_display.engine_line)):
             color = self.engine_display.engine_line[0]
         success = self.board.move(Colors(color), self.parity)
-        self.grid.refresh()
+        self.grid.sync()
         self.parity ^= success
         self.engine_display.set_parity(self.parity)
-        self.run_worker(
-            self.engine_display.engine.IDDFS(self.parity, self.engine_display.max_depth, self.engine_display.update_move),
-            exclusive=True
-        )
+        self.run_worker(self.engine_display.start_search(), exclusive=True)
 
     def action_undo(self):
         success = self.board.undo_move()
-        self.grid.refresh()
+        self.grid.sync()
         self.parity ^= success
         self.engine_display.set_parity(self.parity)
-        self.run_worker(
-            self.engine_display.engine.IDDFS(self.parity, self.engine_display.max_depth, self.engine_display.update_move),
-            exclusive=True
-        )
+        self.run_worker(self.engine_display.start_search(), exclusive=True)
 
     def compose(self):
         yield self.grid
@@ -1,6 +1,32 @@
+"""Reads the 7x8 board out of a game screenshot.
+
+The board outline is found on a downscaled copy and then refined at full resolution around it.
+Each cell is sampled by the median of its inner part, away from borders and glare, and matched in
+Lab space against a palette calibrated per screen size and theme. Boards with a cell too close to
+call raise UncertainCells rather than coming back wrong. Run as a module to detect a batch of
+screenshots or directories in parallel, one JSON line per image followed by per-stage timings on
+stderr:
+
+    python -m src.griddetection assets/ --workers 4
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
 import cv2
 import numpy as np
 
+default_palette_cache = Path.home() / ".cache" / "fillerbot" / "palettes.json"
+
+class UncertainCells(ValueError):
+    """Raised by process() when some cells could not be told apart with enough confidence"""
+
+    def __init__(self, cells: list[tuple[int, int]]):
+        self.cells = cells
+        super().__init__(f"Unsure of {len(cells)} cell color(s) at {', '.join(f'({i}, {j})' for i, j in cells)}")
+
 class GridDetection:
     hex_colors = {
         0: "#e55767",
@@ -10,47 +36,205 @@ class GridDetection:
         4: "#6b539f",
         5: "#414141"
     }
+    n = 7
+    m = 8
+    max_side = 640 # longest side of the copy the outline is first searched on
+    kernel = np.ones((3, 3), np.uint8)
+    inset = 0.25 # fraction of each cell's width and height left out on every side when sampling
+    min_confidence = 0.25
+    max_samples = 20 # calibration weighs a new board at least 1 / (max_samples + 1)
 
-    def __init__(self):
+    def __init__(self, palette_cache: Path = None):
         self.grid = None  # Initialize as None
+        self.confidence = None # per-cell confidence of the last process(), 0 (a tie) to 1 (exact match)
+        self.uncertain = [] # cells of the last process() below min_confidence
+        self.profile = None # screen size and theme of the last process(), selects the palette
+        self.timings = {} # seconds spent in each stage of the last process()
+        rgb = np.array([[self.hex_to_nparr(x) for x in range(len(self.hex_colors))]], dtype=np.float32)
+        self.default_palette = self.to_lab(rgb[..., ::-1])[0]
+        self.palette_cache = palette_cache
+        self.palettes = None # profile -> {"palette": Lab rows, "samples": boards seen per color}, loaded lazily
 
     def hex_to_nparr(self, x):
         color = self.hex_colors.get(x)
         return np.array([int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)])
 
-    def process(self, file_path: str):
-        img = cv2.imread(file_path)
-        if img is None:
-            raise ValueError(f"Failed to read image: {file_path}")
-
+    def outline(self, img, low: float = 6, high: float = 15):
+        """Bounding box (x, y, w, h) of the largest edge contour"""
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         blur = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blur, 6, 15)
-        kernel = np.ones((3, 3), np.uint8)
-        edges = cv2.dilate(edges, kernel, iterations=2)
+        edges = cv2.Canny(blur, low, high)
+        edges = cv2.dilate(edges, self.kernel, iterations=2)
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
         if not contours:
             raise ValueError("No contours in image...")
+        return cv2.boundingRect(max(contours, key=cv2.contourArea))
 
-        contour = [max(contours, key=lambda x: cv2.contourArea(x))]
-        x, y, w, h = cv2.boundingRect(contour[0])
-        cropped = img[y:y+h, x:x+w]
+    def locate(self, img):
+        """Finds the board on a downscaled copy, then repeats the search at full resolution in a
+        padded window around it so the box matches a full-size search"""
+        height, width, _ = img.shape
+        scale = self.max_side / max(height, width)
+        if scale >= 1:
+            return self.outline(img)
 
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+        # shrinking steepens soft gradients like drop shadows, so raise the thresholds to match
+        x, y, w, h = self.outline(small, 6 / scale, 15 / scale)
+        pad = int(8 / scale)
+        x0, y0 = max(0, int(x / scale) - pad), max(0, int(y / scale) - pad)
+        x1, y1 = min(width, int((x + w) / scale) + pad), min(height, int((y + h) / scale) + pad)
+        x, y, w, h = self.outline(img[y0:y1, x0:x1])
+        return x0 + x, y0 + y, w, h
+
+    def to_lab(self, bgr):
+        return cv2.cvtColor(np.asarray(bgr, dtype=np.float32) / 255, cv2.COLOR_BGR2Lab)
+
+    def cell_colors(self, cropped):
+        """Lab color of every cell as a (7, 8, 3) array, the per-channel median of its inner part"""
         n, m, _ = cropped.shape
-        cropped = cropped[: (n // 7) * 7, : (m // 8) * 8, :]
-        n, m, _ = cropped.shape
-        grid = np.empty((7, 8), dtype=int)
+        h, w = n // self.n, m // self.m
+        dy, dx = int(h * self.inset), int(w * self.inset)
+        if h - 2 * dy < 1 or w - 2 * dx < 1:
+            raise ValueError("Board outline too small")
+        cells = cropped[:h * self.n, :w * self.m].reshape(self.n, h, self.m, w, 3)
+        inner = cells[:, dy:h - dy, :, dx:w - dx].swapaxes(1, 2).reshape(self.n, self.m, -1, 3)
+        return self.to_lab(np.median(inner, axis=2))
+
+    def classify(self, colors, palette):
+        """Index of the nearest palette color for each cell, and how confident that choice is:
+        1 - (distance to the nearest color / distance to the runner-up)"""
+        distances = np.sqrt(((colors[..., None, :] - palette) ** 2).sum(axis=-1))
+        nearest, runner_up = np.sort(distances, axis=-1)[..., :2].transpose(2, 0, 1)
+        return distances.argmin(axis=-1), 1 - nearest / np.maximum(runner_up, 1e-9)
+
+    def profile_of(self, img, x: int, y: int, w: int, h: int) -> str:
+        """Screen size plus light or dark theme, judged by the background just above the board"""
+        height, width, _ = img.shape
+        above = img[max(0, y - max(1, h // 20)):y, x:x + w]
+        if not above.size:
+            above = img
+        theme = "light" if np.median(above) >= 128 else "dark"
+        return f"{width}x{height}-{theme}"
+
+    def load_palettes(self) -> dict:
+        if self.palettes is None:
+            self.palettes = {}
+            if self.palette_cache is not None and Path(self.palette_cache).is_file():
+                try:
+                    self.palettes = json.loads(Path(self.palette_cache).read_text())
+                except (OSError, ValueError):
+                    pass
+        return self.palettes
 
-        for i in range(7):
-            for j in range(8):
-                cell = cropped[i * n // 7 : (i + 1) * n // 7, j * m // 8 : (j + 1) * m // 8]
-                avg_color = np.average(cell, axis=(0, 1))[::-1]  # Convert BGR to RGB
-                grid[i][j] = min(range(6), key=lambda x: np.linalg.norm(avg_color - self.hex_to_nparr(x)))
+    def palette(self, profile: str):
+        """Calibrated Lab palette for profile, or the stock colors if there is none yet"""
+        entry = self.load_palettes().get(profile)
+        if entry is None:
+            return self.default_palette
+        return np.array(entry["palette"], dtype=np.float32)
 
-        self.grid = grid
+    def calibrate(self, profile: str, colors, grid):
+        """Moves each palette color toward the median of the cells classified as it, then saves"""
+        palettes = self.load_palettes()
+        entry = palettes.get(profile) or {"palette": self.default_palette.tolist(), "samples": [0] * len(self.hex_colors)}
+        palette = np.array(entry["palette"], dtype=np.float32)
+        for color in np.unique(grid):
+            k = min(entry["samples"][color], self.max_samples)
+            palette[color] = (palette[color] * k + np.median(colors[grid == color], axis=0)) / (k + 1)
+            entry["samples"][color] += 1
+        entry["palette"] = palette.tolist()
+        palettes[profile] = entry
+        if self.palette_cache is not None:
+            path = Path(self.palette_cache)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(json.dumps(palettes))
+            except OSError:
+                pass
+
+    def process(self, file_path: str):
+        start = time.perf_counter()
+        img = cv2.imread(str(file_path))
+        if img is None:
+            raise ValueError(f"Failed to read image: {file_path}")
+        read = time.perf_counter()
+
+        x, y, w, h = self.locate(img)
+        located = time.perf_counter()
+
+        colors = self.cell_colors(img[y:y+h, x:x+w])
+        sampled = time.perf_counter()
+
+        self.profile = self.profile_of(img, x, y, w, h)
+        self.grid, self.confidence = self.classify(colors, self.palette(self.profile))
+        self.uncertain = [(int(i), int(j)) for i, j in np.argwhere(self.confidence < self.min_confidence)]
+        done = time.perf_counter()
+        self.timings = {"read": read - start, "locate": located - read, "sample": sampled - located, "classify": done - sampled}
+        if self.uncertain:
+            raise UncertainCells(self.uncertain)
+        self.calibrate(self.profile, colors, self.grid)
 
     def get_board(self):
         if self.grid is not None:
             return self.grid.tolist()
         return None
+
+def image_paths(sources: list[str]) -> list[Path]:
+    """Expands directories into the screenshots they contain"""
+    from .analyze import image_extensions
+    paths = []
+    for source in map(Path, sources):
+        if source.is_dir():
+            paths += sorted(p for p in source.iterdir() if p.suffix.lower() in image_extensions)
+        else:
+            paths.append(source)
+    return paths
+
+_detector = None
+
+def detect(path) -> dict:
+    """Detects one screenshot, reporting {"id", "board", "timings"} or {"id", "error"}"""
+    global _detector
+    if _detector is None:
+        _detector = GridDetection()
+    try:
+        _detector.process(path)
+    except ValueError as e:
+        return {"id": str(path), "error": str(e)}
+    return {"id": str(path), "board": _detector.get_board(), "timings": _detector.timings}
+
+def detect_all(paths, workers: int = 1):
+    """Yields detect results in input order, spreading images over worker processes"""
+    if workers <= 1:
+        yield from map(detect, paths)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(detect, paths)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read boards out of Filler screenshots")
+    parser.add_argument("sources", nargs="+", help="screenshots or directories of them")
+    parser.add_argument("--workers", type=int, default=1, help="images processed in parallel")
+    parser.add_argument("-o", "--output", default="-", help="output file (default stdout)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    totals = {}
+    count = 0
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    with out:
+        for result in detect_all(image_paths(args.sources), args.workers):
+            for stage, seconds in result.get("timings", {}).items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+            count += 1
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+    elapsed = time.perf_counter() - start
+    stages = "  ".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in totals.items())
+    print(f"{count} images in {elapsed:.3f}s  {stages}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+from .board import Board
+from .engine import Engine
+from .transposition import SharedTranspositionTable, TranspositionTable
+
+# per-process state, set up by _init_worker
+_engine = None
+_tt = None
+_search_id = None
+
+def _init_worker(tt, search_id):
+    global _tt, _search_id
+    _tt = tt
+    _search_id = search_id
+
+class HelperEngine(Engine):
+    """Engine run by a helper process; it tries root moves starting `offset` places down the order,
+    so helpers fill the shared table with lines the main search hasn't reached yet"""
+
+    def __init__(self, _board: Board, _tt=None, offset: int = 0):
+        super().__init__(_board, _tt)
+        self.offset = offset
+
+    def get_children(self, cur_board: Board, player: int, ply: int, tt_move=None) -> int:
+        count = super().get_children(cur_board, player, ply, tt_move)
+        if ply == 0 and count > 1:
+            moves = self.move_buffer[0]
+            k = self.offset % count
+            moves[:count] = moves[k:count] + moves[:k]
+        return count
+
+def _help(board: Board, player: int, depth: int, search_id: int, settings: dict, offset: int) -> int:
+    """Deepens board inside a helper process until the search with search_id ends; returns the nodes searched"""
+    global _engine
+    if _engine is None:
+        _engine = HelperEngine(board, _tt)
+    _engine.board = board
+    _engine.offset = offset
+    _engine.abort = lambda: _search_id.value != search_id
+    for name, value in settings.items():
+        setattr(_engine, name, value)
+    start = _engine.count
+    _engine.deepen(player, depth)
+    return _engine.count - start
+
+class ParallelEngine(Engine):
+    """Engine that searches with helper processes sharing its transposition table (Lazy SMP).
+
+    Every deepen() starts workers - 1 helpers deepening the same position while this process
+    runs the search as usual. The helpers only matter through the table: their entries cut off
+    or order this process's search, and its result is the one reported. When it finishes, is
+    stopped or runs out of time, a shared search id is bumped, which ends the helpers' searches.
+    With a single worker there are no helpers and this is a plain Engine."""
+
+    def __init__(self, _board: Board, workers: int = 0, _tt=None, book=None):
+        self.workers = workers or os.cpu_count() or 1
+        if _tt is None and self.workers > 1:
+            _tt = SharedTranspositionTable()
+        super().__init__(_board, _tt, book=book)
+        self.context = multiprocessing.get_context("spawn")
+        self.search_id = self.context.Value('i', 0)
+        self.pool = None
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers - 1, mp_context=self.context,
+                                            initializer=_init_worker, initargs=(self.tt, self.search_id))
+        return self.pool
+
+    def end_helpers(self) -> int:
+        """Ends the running helper searches; returns the id for the next search"""
+        with self.search_id.get_lock():
+            self.search_id.value += 1
+            return self.search_id.value
+
+    def close(self):
+        """Stops the search or ponder in progress and waits for it, then ends the helper processes
+        and frees the shared table. A search started afterwards runs alone on a private table."""
+        self.stop.set()
+        with self.lock:
+            self.end_helpers()
+            if self.pool is not None:
+                # workers still starting up need the shared objects until they're running
+                self.pool.shutdown(wait=True, cancel_futures=True)
+                self.pool = None
+            if isinstance(self.tt, SharedTranspositionTable) and self.tt.owner:
+                self.tt.close()
+                self.tt = TranspositionTable()
+
+    def deepen(self, player: int, depth: int, callback=None, time_limit: float = None, node_limit: int = None,
+               stop: threading.Event = None, stats=None, position: Board = None):
+        board = position if position is not None else self.board.clone()
+        if (self.workers <= 1 or not isinstance(self.tt, SharedTranspositionTable) or board.win() != -1
+                or (self.endgame is not None and self.endgame.applies(board))):
+            return super().deepen(player, depth, callback, time_limit, node_limit, stop, stats, board)
+
+        search_id = self.end_helpers()
+        pool = self.get_pool()
+        settings = self.settings()
+        helpers = [pool.submit(_help, board.clone(), player, depth, search_id, settings, i + 1)
+                   for i in range(self.workers - 1)]
+        try:
+            return super().deepen(player, depth, callback, time_limit, node_limit, stop, stats, board)
+        finally:
+            self.end_helpers()
+            for helper in helpers:
+                if not helper.cancel():
+                    self.count += helper.result()
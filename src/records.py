@@ -0,0 +1,215 @@
+"""Compact game records: the initial grid and the moves played, for archives of many games.
+
+An archive is a short header followed by records appended one after another. Each record is
+n and m (a byte each), the move count (2 bytes, little-endian), the grid packed at 3 bits per
+cell (21 bytes for 7x8), then one byte per move holding the color in its low 3 bits and the
+player in bit 3. A 30-move game takes 55 bytes. Archives are memory-mapped for reading, so
+worker processes share one copy of a large archive. Analyze every position of every game:
+
+    python -m src.records games.frec --depth 8 --workers 8 > analysis.jsonl
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+import argparse
+import json
+import mmap
+import sys
+from .board import Board
+from .engine import Engine
+from .tile import Colors
+
+magic = b"FGAME1\0\0"
+
+def grid_size(n: int, m: int) -> int:
+    return (n * m * 3 + 7) // 8
+
+def pack_grid(grid: list[list[int]]) -> bytes:
+    packed = 0
+    shift = 0
+    for row in grid:
+        for color in row:
+            packed |= color << shift
+            shift += 3
+    return packed.to_bytes(grid_size(len(grid), len(grid[0])), "little")
+
+def unpack_grid(data: bytes, n: int, m: int) -> list[list[int]]:
+    packed = int.from_bytes(data, "little")
+    return [[(packed >> 3 * (i * m + j)) & 7 for j in range(m)] for i in range(n)]
+
+def encode(grid: list[list[int]], moves: list[tuple[int, int]]) -> bytes:
+    """Record bytes for a game; moves are (player, color) pairs in the order played"""
+    n, m = len(grid), len(grid[0])
+    return (bytes([n, m]) + len(moves).to_bytes(2, "little") + pack_grid(grid)
+            + bytes(color | player << 3 for player, color in moves))
+
+def game_record(board: Board) -> tuple[list[list[int]], list[tuple[int, int]]]:
+    """(initial grid, moves) of the game board has been through"""
+    grid = [[0] * board.m for _ in range(board.n)]
+    for color, mask in enumerate(board.color_masks):
+        while mask:
+            low = mask & -mask
+            i, j = divmod(low.bit_length() - 1, board.m)
+            grid[i][j] = color
+            mask ^= low
+    # the stack holds the color each move replaced, so read colors played from the end back
+    colors = list(board.player_colors)
+    moves = []
+    for entry in reversed(board.stack):
+        moves.append((entry[0], colors[entry[0]]))
+        colors[entry[0]] = entry[2]
+    moves.reverse()
+    # Board() itself captures same-colored cells next to the corners, those aren't moves
+    setup = len(board_class(board.n, board.m)(grid).stack)
+    return grid, moves[setup:]
+
+@lru_cache(maxsize=None)
+def board_class(n: int, m: int) -> type:
+    if (n, m) == (Board.n, Board.m):
+        return Board
+    # built at runtime, so pickle can't find the class by name; rebuild it from the size instead
+    reduce = lambda self: (_unpickle, (self.n, self.m, self.__getstate__()))
+    return type(f"Board{n}x{m}", (Board,), {"n": n, "m": m, "__slots__": (), "__reduce__": reduce})
+
+def _unpickle(n: int, m: int, state: tuple) -> Board:
+    cls = board_class(n, m)
+    board = cls.__new__(cls)
+    board.__setstate__(state)
+    return board
+
+def append(path: Path, games) -> int:
+    """Appends (grid, moves) games to the archive at path, creating it if needed; returns how many"""
+    path = Path(path)
+    count = 0
+    with open(path, "ab") as f:
+        if f.tell() == 0:
+            f.write(magic)
+        for grid, moves in games:
+            f.write(encode(grid, moves))
+            count += 1
+    return count
+
+def restore(grid: list[list[int]], moves: list[tuple[int, int]]) -> Board:
+    """Board after the game's moves, with its move stack, so they can be undone"""
+    board = board_class(len(grid), len(grid[0]))(grid)
+    for player, color in moves:
+        if not board.move(color, player):
+            raise ValueError(f"illegal move {color} by player {player}")
+    return board
+
+def replay(grid: list[list[int]], moves: list[tuple[int, int]]):
+    """Yields (board, player, color played) for each position of a game in order.
+
+    The same board is updated in place between positions; clone it to keep one."""
+    board = board_class(len(grid), len(grid[0]))(grid)
+    for player, color in moves:
+        yield board, player, color
+        if not board.move(color, player):
+            raise ValueError(f"illegal move {color} by player {player}")
+
+class GameArchive:
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            if f.read(len(magic)) != magic:
+                raise ValueError(f"{path} is not a game archive")
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = []
+        offset = len(magic)
+        while offset + 4 <= len(self.data):
+            n, m = self.data[offset], self.data[offset + 1]
+            count = self.data[offset + 2] | self.data[offset + 3] << 8
+            self.offsets.append(offset)
+            offset += 4 + grid_size(n, m) + count
+        if offset != len(self.data):
+            raise ValueError(f"{path} ends in a truncated record")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> tuple[list[list[int]], list[tuple[int, int]]]:
+        offset = self.offsets[index]
+        n, m = self.data[offset], self.data[offset + 1]
+        count = self.data[offset + 2] | self.data[offset + 3] << 8
+        start = offset + 4 + grid_size(n, m)
+        grid = unpack_grid(self.data[offset + 4:start], n, m)
+        return grid, [(move >> 3, move & 7) for move in self.data[start:start + count]]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def close(self):
+        self.data.close()
+
+_archive = None
+
+def analyze_game(args) -> list[dict]:
+    """Searches every position of one archived game, reporting them like src.analyze does plus
+    the move that was played"""
+    from .analyze import json_score
+    global _archive
+    path, index, depth, time_limit, node_limit = args
+    # reopen when the archive has been appended to or rewritten since this process mapped it
+    if (_archive is None or _archive[0] != path or index >= len(_archive[1])
+            or Path(path).stat().st_size != len(_archive[1].data)):
+        if _archive is not None:
+            _archive[1].close()
+        _archive = path, GameArchive(path)
+    results = []
+    engine = None
+    for ply, (board, player, played) in enumerate(replay(*_archive[1][index])):
+        if engine is None:
+            engine = Engine(board)
+        count = engine.count
+        score, line = engine.search(player, depth, time_limit=time_limit, node_limit=node_limit)
+        results.append({
+            "record": index,
+            "ply": ply,
+            "player": player,
+            "played": Colors(played).name,
+            "move": line[0].name if line else None,
+            "eval": json_score(score),
+            "pv": [color.name for color in line],
+            "depth": engine.completed_depth,
+            "nodes": engine.count - count,
+        })
+    return results
+
+def analyze_archive(path: Path, depth: int = 8, time_limit: float = None, node_limit: int = None,
+                    workers: int = 1, records=None):
+    """Yields analyze_game results for each position in archive order, spreading games over
+    worker processes; records limits the analysis to those record indices"""
+    if records is None:
+        archive = GameArchive(path)
+        records = range(len(archive))
+        archive.close()
+    jobs = ((str(path), index, depth, time_limit, node_limit) for index in records)
+    if workers <= 1:
+        for results in map(analyze_game, jobs):
+            yield from results
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        for results in pool.map(analyze_game, jobs):
+            yield from results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze every position of an archive of games")
+    parser.add_argument("archive", help="game archive written by the app or src.tournament --record")
+    parser.add_argument("--depth", type=int, default=None, help="deepest search in plies (default 8, or 60 with --time/--nodes)")
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="node budget per position")
+    parser.add_argument("--workers", type=int, default=1, help="games analyzed in parallel")
+    parser.add_argument("-o", "--output", default="-", help="output file (default stdout)")
+    args = parser.parse_args(argv)
+
+    depth = args.depth or (60 if args.time or args.nodes else 8)
+    count = 0
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    with out:
+        for result in analyze_archive(args.archive, depth, args.time, args.nodes, args.workers):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            count += 1
+    print(f"{args.archive}: {count} positions", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
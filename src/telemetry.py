@@ -0,0 +1,93 @@
+"""Search instrumentation: per-iteration counters and optional per-phase timing.
+
+Engine.deepen reports one stats dict per completed iteration (see Engine.iterations) with the
+depth, nodes, nodes per second, cutoffs, first-move cutoff rate, table hit rate and timings.
+Setting Engine.phases to a dict also times move generation, Board.move, Board.undo_move and
+Board.eval, at some cost to speed; Engine.profiler takes a profiler to run around each search.
+"""
+from time import perf_counter
+from .board import Board
+
+phase_names = ("movegen", "move", "undo", "eval")
+
+class TimedBoard(Board):
+    """Board whose move, undo_move and eval add their running time to `phases`.
+
+    Moves made by the endgame solver are included, so phases can overlap with solver time."""
+    __slots__ = ("phases",)
+
+    @classmethod
+    def wrap(cls, board: Board, phases: dict):
+        timed = cls.__new__(cls)
+        for name in Board.__slots__:
+            setattr(timed, name, getattr(board, name))
+        timed.phases = phases
+        return timed
+
+    def __getstate__(self):
+        return super().__getstate__(), self.phases
+
+    def __setstate__(self, state):
+        super().__setstate__(state[0])
+        self.phases = state[1]
+
+    def clone(self):
+        new = super().clone()
+        new.phases = self.phases
+        return new
+
+    def move(self, color, player, color_check=True):
+        start = perf_counter()
+        moved = super().move(color, player, color_check)
+        self.phases["move"] += perf_counter() - start
+        return moved
+
+    def undo_move(self):
+        start = perf_counter()
+        undone = super().undo_move()
+        self.phases["undo"] += perf_counter() - start
+        return undone
+
+    def eval(self, player: int, *args):
+        start = perf_counter()
+        score = super().eval(player, *args)
+        self.phases["eval"] += perf_counter() - start
+        return score
+
+def timed(method, phases: dict, name: str):
+    """method with its running time added to phases[name]"""
+    def call(*args):
+        start = perf_counter()
+        result = method(*args)
+        phases[name] += perf_counter() - start
+        return result
+    return call
+
+def new_phases() -> dict:
+    return dict.fromkeys(phase_names, 0.0)
+
+def iteration_stats(depth: int, nodes: int, cutoffs: int, first_cutoffs: int, probes: int, hits: int,
+                    seconds: float, elapsed: float, phases: dict = None) -> dict:
+    stats = {
+        "depth": depth,
+        "nodes": nodes,
+        "nps": nodes / seconds if seconds > 0 else 0.0,
+        "cutoffs": cutoffs,
+        "first_move_cutoff_rate": first_cutoffs / cutoffs if cutoffs else None,
+        "tt_hit_rate": hits / probes if probes else None,
+        "seconds": seconds,
+        "elapsed": elapsed,
+    }
+    if phases is not None:
+        stats["phases"] = phases
+    return stats
+
+def format_stats(stats: dict) -> str:
+    """One-line summary of an iteration for display"""
+    parts = [f"depth {stats['depth']}", f"{stats['nodes']:,} nodes", f"{stats['nps'] / 1000:.0f}k nps"]
+    if stats["tt_hit_rate"] is not None:
+        parts.append(f"TT {stats['tt_hit_rate']:.0%}")
+    if stats["first_move_cutoff_rate"] is not None:
+        parts.append(f"1st cut {stats['first_move_cutoff_rate']:.0%}")
+    parts.append(f"{stats['elapsed']:.2f}s")
+    return "  ".join(parts)
@@ -1,9 +1,12 @@
-from enum import Enum
+from enum import IntEnum
 
-class Colors(Enum):
+class Colors(IntEnum):
+    """Boards and the engine work on the plain int codes; members compare and hash equal to them"""
     red, green, yellow, blue, purple, black, empty = range(7)
 
 class Tile:
+    __slots__ = ("color", "x", "y", "owner")
+
     def __init__(self, _color: Colors, _x: int, _y: int, _owner=-1):
         self.color = _color
         self.x = _x
@@ -11,7 +14,4 @@ class Tile:
         self.owner = _owner
 
     def copy(self):
-        new_tile = Tile(Colors(self.color), self.x, self.y)
-        new_tile.owner = self.owner
-        return new_tile
-
+        return Tile(self.color, self.x, self.y, self.owner)
@@ -0,0 +1,200 @@
+"""Self-play matches between two engine configurations.
+
+A configuration is a comma-separated list of search limits, eval weights and selective search
+settings, e.g. "depth=8" or "depth=6,time=0.2,frontier=0.5,lmr=1,dead=prune" (keys: depth, time,
+nodes, tiles, control, frontier, lmr, lmr_moves, futility, dead). Games start from random boards
+in pairs, each config playing both sides of the same board, and run in parallel:
+
+    python -m src.tournament --a depth=8 --b depth=6 --games 200 --workers 8
+
+The report gives the first config's score, its Elo difference with a 95% confidence interval,
+and each config's average time and nodes per move.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from .board import Board, default_weights
+from .engine import Engine, search_settings
+from . import records
+
+weight_names = ("tiles", "control", "frontier")
+
+def parse_config(text: str) -> dict:
+    """{"depth", "time", "nodes", "weights"} plus any selective search settings given, from "key=value,..." """
+    config = {"depth": 8, "time": None, "nodes": None, "weights": default_weights}
+    weights = list(default_weights)
+    for item in filter(None, text.split(",")):
+        key, sep, value = item.partition("=")
+        key = key.strip()
+        if not sep:
+            raise ValueError(f"expected key=value, got {item!r}")
+        if key in weight_names:
+            weights[weight_names.index(key)] = float(value)
+        elif key in ("depth", "nodes", "lmr", "lmr_moves"):
+            config[key] = int(value)
+        elif key in ("time", "futility"):
+            config[key] = float(value)
+        elif key == "dead":
+            if value not in ("prune", "reduce"):
+                raise ValueError(f"dead must be prune or reduce, got {value!r}")
+            config["dead_moves"] = value
+        else:
+            raise ValueError(f"unknown setting {key!r}")
+    config["weights"] = tuple(weights)
+    return config
+
+def play_game(grid: list[list[int]], configs: list[dict], max_moves: int = None) -> dict:
+    """Plays configs[0] as player 0 against configs[1] as player 1.
+
+    Returns {"winner": 0, 1 or -1 for a draw, "tiles", "moves", "seconds", "nodes"}, the last
+    two holding per-move measurements for each player. A game still going after max_moves moves
+    goes to whoever owns more tiles."""
+    board = Board(grid)
+    max_moves = max_moves or 4 * board.n * board.m
+    engines = []
+    for config in configs:
+        engine = Engine(board)
+        for name in search_settings:
+            if name in config:
+                setattr(engine, name, config[name])
+        engines.append(engine)
+    seconds, nodes = [[], []], [[], []]
+    moves = []
+    player = 0
+    while board.win() == -1 and len(moves) < max_moves:
+        engine, config = engines[player], configs[player]
+        count = engine.count
+        start = time.perf_counter()
+        score, path = engine.deepen(player, config["depth"], time_limit=config["time"], node_limit=config["nodes"])
+        seconds[player].append(time.perf_counter() - start)
+        nodes[player].append(engine.count - count)
+        if not path or not board.move(path[0], player):
+            break
+        moves.append(path[0])
+        player ^= 1
+
+    tiles = [board.tile_count(0), board.tile_count(1)]
+    winner = board.win()
+    if winner == -1:
+        winner = 0 if tiles[0] > tiles[1] else 1 if tiles[1] > tiles[0] else 2
+    return {"winner": -1 if winner == 2 else winner, "tiles": tiles, "moves": moves, "seconds": seconds, "nodes": nodes}
+
+def _play(args):
+    grid, configs, swap, max_moves = args
+    game = play_game(grid, configs[::-1] if swap else configs, max_moves)
+    if swap:
+        # report everything from the first config's point of view
+        game["winner"] = game["winner"] if game["winner"] == -1 else game["winner"] ^ 1
+        game["seconds"].reverse()
+        game["nodes"].reverse()
+    game["swapped"] = swap
+    game["grid"] = grid
+    return game
+
+def elo(score: float) -> float:
+    """Elo difference implied by an expected score in [0, 1]"""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+def summarize(games: list[dict], z: float = 1.96) -> dict:
+    """Win/draw/loss counts, score and Elo of the first config, with a confidence interval from the
+    spread of the per-game scores, plus each config's mean time and nodes per move"""
+    points = [0.5 if g["winner"] == -1 else float(g["winner"] == 0) for g in games]
+    n = len(points)
+    score = sum(points) / n if n else 0.5
+    spread = math.sqrt(sum((p - score) ** 2 for p in points) / (n - 1)) if n > 1 else 0.0
+    margin = z * spread / math.sqrt(n) if n else 0.0
+    sides = []
+    for side in range(2):
+        seconds = [s for g in games for s in g["seconds"][side]]
+        nodes = [c for g in games for c in g["nodes"][side]]
+        sides.append({
+            "moves": len(seconds),
+            "ms_per_move": 1000 * sum(seconds) / len(seconds) if seconds else 0.0,
+            "nodes_per_move": sum(nodes) / len(nodes) if nodes else 0.0,
+        })
+    return {
+        "games": n,
+        "wins": sum(g["winner"] == 0 for g in games),
+        "draws": sum(g["winner"] == -1 for g in games),
+        "losses": sum(g["winner"] == 1 for g in games),
+        "score": score,
+        "elo": elo(score),
+        "elo_interval": (elo(max(0.0, score - margin)), elo(min(1.0, score + margin))),
+        "a": sides[0],
+        "b": sides[1],
+    }
+
+def random_grids(count: int, seed: int = 0) -> list[list[list[int]]]:
+    state = random.getstate()
+    random.seed(seed)
+    grids = [Board().gen_random() for _ in range(count)]
+    random.setstate(state)
+    return grids
+
+def run_match(a: dict, b: dict, games: int = 100, workers: int = 1, seed: int = 0, max_moves: int = None):
+    """Yields play results as games finish, from the first config's point of view; games come in
+    pairs over the same board with the sides swapped"""
+    jobs = [(grid, [a, b], swap, max_moves) for grid in random_grids((games + 1) // 2, seed) for swap in (False, True)]
+    jobs = jobs[:games]
+    if workers <= 1:
+        yield from map(_play, jobs)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(_play, jobs)
+
+def json_number(x: float):
+    if math.isfinite(x):
+        return x
+    return "inf" if x > 0 else "-inf"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play two engine configurations against each other")
+    parser.add_argument("--a", default="depth=8", help="first config, e.g. depth=8,frontier=0.5")
+    parser.add_argument("--b", default="depth=6", help="second config")
+    parser.add_argument("--games", type=int, default=100, help="games to play, in color-swapped pairs")
+    parser.add_argument("--workers", type=int, default=1, help="games played in parallel")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random start boards")
+    parser.add_argument("--max-moves", type=int, default=None, help="adjudicate on tile count after this many moves")
+    parser.add_argument("--record", default=None, help="append the games to this game archive (see src.records)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+    try:
+        a, b = parse_config(args.a), parse_config(args.b)
+    except ValueError as e:
+        parser.error(str(e))
+
+    games = []
+    start = time.perf_counter()
+    for game in run_match(a, b, args.games, args.workers, args.seed, args.max_moves):
+        games.append(game)
+        if args.record:
+            records.append(args.record, [(game["grid"], [(ply % 2, color) for ply, color in enumerate(game["moves"])])])
+        if not args.json:
+            print(f"\r{len(games)}/{args.games} games", end="", file=sys.stderr, flush=True)
+    elapsed = time.perf_counter() - start
+    summary = summarize(games)
+
+    if args.json:
+        summary["elo"] = json_number(summary["elo"])
+        summary["elo_interval"] = [json_number(x) for x in summary["elo_interval"]]
+        summary.update(config_a=args.a, config_b=args.b, seconds=elapsed)
+        print(json.dumps(summary))
+        return
+    low, high = summary["elo_interval"]
+    print(file=sys.stderr)
+    print(f"{args.a} vs {args.b}: +{summary['wins']} ={summary['draws']} -{summary['losses']}  "
+          f"score {summary['score']:.3f}  Elo {summary['elo']:+.0f} [{low:+.0f}, {high:+.0f}]  ({elapsed:.1f}s)")
+    for name, config in (("a", args.a), ("b", args.b)):
+        side = summary[name]
+        print(f"  {config}: {side['ms_per_move']:.1f}ms and {side['nodes_per_move']:.0f} nodes per move over {side['moves']} moves")
+
+if __name__ == "__main__":
+    main()
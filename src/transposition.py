@@ -0,0 +1,128 @@
+from multiprocessing import shared_memory
+import struct
+import numpy as np
+
+EXACT, LOWER, UPPER = range(3)
+_word = struct.Struct("<Q")
+_double = struct.Struct("<d")
+
+class TranspositionTable:
+    """Fixed-size hash table of searched positions.
+
+    Entries are (key, depth, score, flag, move, generation) tuples. The table
+    never grows past `max_mb`; when two positions share a slot `policy`
+    decides which one stays:
+        "always": the newest entry wins
+        "depth": the deeper entry wins, entries from older searches are always replaced
+    """
+    entry_size = 160 # rough bytes per stored tuple including its ints and float
+    policies = ("always", "depth")
+
+    def __init__(self, max_mb: float = 32, policy: str = "depth"):
+        if policy not in self.policies:
+            raise ValueError(f"Unknown replacement policy: {policy}")
+        self.policy = policy
+        self.size = max(1, int(max_mb * (1 << 20)) // self.entry_size)
+        self.table = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.table = [None] * self.size
+        self.generation = 0
+
+    def probe(self, key: int):
+        self.probes += 1
+        entry = self.table[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: float, flag: int, move):
+        idx = key % self.size
+        old = self.table[idx]
+        if (old is not None and self.policy == "depth"
+            and old[5] == self.generation and old[1] > depth):
+            return
+        self.table[idx] = (key, depth, score, flag, move, self.generation)
+
+class SharedTranspositionTable(TranspositionTable):
+    """TranspositionTable in shared memory, for processes searching at the same time.
+
+    Each slot is three 64-bit words: a check word, the packed depth, flag, move and generation,
+    and the score's bits. The check word is the key xor the other two, so a slot torn by two
+    processes writing it at once fails the check on probe instead of returning a mixed entry,
+    without any locking. Pickling hands over the block's name, and the copy attaches to it."""
+    entry_size = 24
+
+    def __init__(self, max_mb: float = 32, policy: str = "depth", name: str = None):
+        if policy not in self.policies:
+            raise ValueError(f"Unknown replacement policy: {policy}")
+        self.policy = policy
+        self.max_mb = max_mb
+        self.size = max(1, int(max_mb * (1 << 20)) // self.entry_size)
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=8 * (1 + 3 * self.size))
+        self.words = np.ndarray(1 + 3 * self.size, dtype=np.uint64, buffer=self.memory.buf)
+        self.checks = self.words[1::3]
+        self.data = self.words[2::3]
+        self.scores = self.words[3::3]
+        if self.owner:
+            self.words[:] = 0
+        self.probes = 0
+        self.hits = 0
+
+    def __getstate__(self):
+        return self.max_mb, self.policy, self.memory.name
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    @property
+    def generation(self) -> int:
+        return int(self.words[0])
+
+    def new_search(self):
+        # only the creator advances the generation, so attached copies keep sharing its entries
+        if self.owner:
+            self.words[0] = (int(self.words[0]) + 1) & 0xFF
+
+    def clear(self):
+        self.words[:] = 0
+
+    def probe(self, key: int):
+        self.probes += 1
+        idx = key % self.size
+        data = int(self.data[idx])
+        bits = int(self.scores[idx])
+        if int(self.checks[idx]) ^ data ^ bits != key or not data:
+            return None
+        self.hits += 1
+        move = (data >> 10) & 7
+        score = _double.unpack(_word.pack(bits))[0]
+        return key, data & 0xFF, score, (data >> 8) & 3, move - 1 if move else None, (data >> 13) & 0xFF
+
+    def store(self, key: int, depth: int, score: float, flag: int, move):
+        idx = key % self.size
+        generation = int(self.words[0])
+        old = int(self.data[idx])
+        if self.policy == "depth" and (old >> 13) & 0xFF == generation and old & 0xFF > depth:
+            return
+        # bit 21 keeps an entry nonzero so an empty slot never passes for one
+        data = min(depth, 0xFF) | flag << 8 | (0 if move is None else move + 1) << 10 | generation << 13 | 1 << 21
+        bits = _word.unpack(_double.pack(score))[0]
+        self.data[idx] = data
+        self.scores[idx] = bits
+        self.checks[idx] = key ^ data ^ bits
+
+    def close(self):
+        """Detaches from the shared block, and frees it if this table created it"""
+        del self.words, self.checks, self.data, self.scores
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -14,8 +14,8 @@ class Visualizer:
         for i in range(self.n):
             row = []
             for j in range(self.m):
-                color = Colors(board.board[i][j].color).name
-                owner = board.board[i][j].owner
+                color = board.color_at(i, j).name
+                owner = board.owner_at(i, j)
                 if (owner != -1):
                     color = Colors(board.player_colors[owner]).name
                 row.append(Panel("  ", style=f"on {color}", padding=(1, 2), expand=True, border_style=color))
@@ -0,0 +1,26 @@
+import json
+
+from src.analyze import analyze_position, read_positions
+from tests.test_board import GRID
+
+
+def test_analyze_position_reports_search(tmp_path):
+    source = tmp_path / "positions.jsonl"
+    source.write_text(json.dumps({"board": GRID, "player": 1}) + "\n\n" + json.dumps({"board": [[0]]}) + "\n")
+    good, bad = [analyze_position(position, depth=4) for position in read_positions([str(source)])]
+    assert good["id"] == f"{source}:1"
+    assert good["player"] == 1 and good["depth"] == 4
+    assert good["move"] == good["pv"][0]
+    assert good["nodes"] > 0
+    assert "error" in bad
+
+
+def test_bad_lines_are_reported_not_raised(tmp_path):
+    source = tmp_path / "positions.jsonl"
+    red = [["red"] * len(row) for row in GRID]
+    source.write_text("\n".join([json.dumps({"board": GRID}), "{not json", json.dumps({"board": red}),
+                                 json.dumps({"board": GRID, "player": 2}), "[1, 2]"]) + "\n")
+    results = [analyze_position(position, depth=2) for position in read_positions([str(source)])]
+    assert "error" not in results[0]
+    assert [result["id"] for result in results[1:]] == [f"{source}:{i}" for i in range(2, 6)]
+    assert all("error" in result for result in results[1:])
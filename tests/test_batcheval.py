@@ -0,0 +1,26 @@
+import random
+
+import pytest
+
+from src.batcheval import BatchEvaluator
+from src.board import Board
+from src.tile import Colors
+from tests.test_board import GRID
+
+
+def test_batch_matches_board_eval():
+    board = Board(GRID)
+    evaluator = BatchEvaluator(board)
+    rng = random.Random(0)
+    leaves, expected = [], []
+    player = 0
+    while board.win() == -1:
+        board.move(Colors(rng.randrange(6)), player)
+        player ^= 1
+        leaves.append(board.leaf_state())
+        expected.append((board.eval(0), board.eval(1)))
+    for side in range(2):
+        scores = evaluator.evaluate(leaves, side)
+        for score, pair in zip(scores, expected):
+            assert score == pytest.approx(pair[side], abs=1e-12)
+
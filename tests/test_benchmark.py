@@ -0,0 +1,18 @@
+from src.benchmark import load_corpus, position_board, regressions, run
+
+
+def test_corpus_replays():
+    corpus = load_corpus(assets=False)
+    assert {p["id"].split("-")[0] for p in corpus} == {"opening", "midgame", "endgame"}
+    for position in corpus:
+        board = position_board(position)
+        assert board.win() == -1
+        assert len(board.stack) == len(position["moves"])
+
+
+def test_regressions_flag_slowdowns():
+    baseline = run(load_corpus(assets=False)[:2], 4)
+    assert regressions(baseline, baseline) == []
+    slower = {**baseline, "summary": {**baseline["summary"], "nodes_per_sec": baseline["summary"]["nodes_per_sec"] / 2}}
+    assert any("nodes_per_sec" in line for line in regressions(baseline, slower))
+    assert regressions(baseline, {**baseline, "depth": 6})
@@ -0,0 +1,121 @@
+import pickle
+
+from src.board import Board
+from src.records import board_class
+from src.telemetry import TimedBoard, new_phases
+from src.tile import Colors
+
+GRID = [
+    [0, 1, 2, 3, 4, 5, 0, 1],
+    [1, 2, 3, 4, 5, 0, 1, 2],
+    [2, 3, 4, 5, 0, 1, 2, 3],
+    [3, 4, 5, 0, 1, 2, 3, 4],
+    [4, 5, 0, 1, 2, 3, 4, 5],
+    [5, 0, 1, 2, 3, 4, 5, 0],
+    [0, 1, 2, 3, 4, 5, 0, 1],
+]
+
+
+def test_initial_state():
+    board = Board(GRID)
+    assert board.player_colors == [Colors.red, Colors.green]
+    assert board.tile_count(0) == 1 and board.tile_count(1) == 1
+    assert board.owner_at(6, 0) == 0 and board.owner_at(0, 7) == 1
+    assert board.win() == -1
+
+
+def test_move_and_undo():
+    board = Board(GRID)
+    assert not board.move(Colors.green, 0)
+    assert board.move(Colors.black, 0)
+    assert board.tile_count(0) == 2
+    assert board.owner_at(5, 0) == 0
+    assert board.get_adjacent_unowned(0)[Colors.green] == [(6, 1)]
+    assert board.undo_move()
+    assert board.tile_count(0) == 1
+    assert board.player_colors[0] == Colors.red
+    assert not Board(GRID).undo_move()
+
+
+def test_clone_is_independent():
+    board = Board(GRID)
+    copy = board.clone()
+    copy.move(Colors.black, 0)
+    assert board.tile_count(0) == 1
+    assert copy.tile_count(0) == 2
+    assert board.eval(0) == -board.eval(1)
+
+
+def test_pickle_drops_tables():
+    board = Board(GRID)
+    board.move(Colors.black, 0)
+    copy = pickle.loads(pickle.dumps(board))
+    assert copy.tables is board.tables
+    assert (copy.owned, copy.player_colors, copy.key(1)) == (board.owned, board.player_colors, board.key(1))
+    assert copy.undo_move() and copy.tile_count(0) == 1
+    assert len(pickle.dumps(board)) < 512
+
+    timed = pickle.loads(pickle.dumps(TimedBoard.wrap(board, new_phases())))
+    assert (timed.owned, timed.key(1), timed.phases) == (board.owned, board.key(1), new_phases())
+    small = board_class(4, 5)([row[:5] for row in GRID[:4]])
+    assert pickle.loads(pickle.dumps(small)).owned == small.owned
+
+
+def test_frontier_tracks_moves():
+    board = Board(GRID)
+    for color in [Colors.black, Colors.blue, Colors.green, Colors.yellow, Colors.red]:
+        for player in range(2):
+            board.move(color, player)
+            occupied = board.owned[0] | board.owned[1]
+            for p in range(2):
+                assert board.frontier(p) == board.neighbors(board.owned[p]) & ~occupied
+    while board.undo_move():
+        pass
+    assert board.frontiers == Board(GRID).frontiers
+
+
+def test_key_follows_moves_and_transpositions():
+    board = Board(GRID)
+    start = board.key(0)
+    assert board.key(1) != start
+    board.move(Colors.black, 0)
+    board.move(Colors.blue, 1)
+    other = Board(GRID)
+    other.move(Colors.blue, 1)
+    other.move(Colors.black, 0)
+    assert (board.owned, board.player_colors) == (other.owned, other.player_colors)
+    assert board.key(0) == other.key(0)
+    while board.undo_move():
+        pass
+    assert board.key(0) == start
+
+
+def test_tables_match_formulas():
+    board = Board(GRID)
+    for p in range(2):
+        for idx in range(board.n * board.m):
+            x, y = divmod(idx, board.m)
+            # the formula the tables replaced, written out so the check doesn't compare the code with itself
+            cx, cy = (board.n - 1, 0) if p == 0 else (0, board.m - 1)
+            dist = ((x - cx) ** 2 + (y - cy) ** 2) ** 0.5 / (board.n ** 2 + board.m ** 2) ** 0.5
+            assert board.tables.gradient[p][idx] == 1 - pow(2, -5 * dist)
+            cells = [nx * board.m + ny for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y))
+                     if board.inside_board(nx, ny)]
+            assert board.tables.neighbor_cells[idx] == cells
+            assert board.neighbors(1 << idx) == sum(1 << c for c in cells)
+
+
+def test_other_board_sizes():
+    class SmallBoard(Board):
+        n = 4
+        m = 5
+
+    board = SmallBoard()
+    assert board.tables is not Board(GRID).tables
+    assert board.tables.gradient[1][0] == 1 - pow(2, -5 * 4 / 41 ** 0.5)
+    player = 0
+    while board.win() == -1:
+        colors = [c for c in Colors if c != Colors.empty and c not in board.player_colors]
+        board.move(max(colors, key=lambda c: board.capture_size(c, player)), player)
+        player ^= 1
+    assert board.tile_count(0) + board.tile_count(1) == 20
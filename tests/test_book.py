@@ -0,0 +1,27 @@
+import pytest
+
+from src.board import Board
+from src.book import OpeningBook, build, canonical
+from src.engine import Engine
+from tests.test_board import GRID
+
+
+def test_book_answers_known_positions(tmp_path):
+    path = tmp_path / "book.bin"
+    OpeningBook.write(path, build([(Board(GRID), 0)], plies=1, depth=4))
+    book = OpeningBook(path)
+    assert len(book) == 5  # the start and its four replies
+
+    engine = Engine(Board(GRID), book=book)
+    score, line = engine.search(0, 4)
+    assert engine.count == 0 and len(line) == 2
+    assert score == pytest.approx(Engine(Board(GRID)).search(0, 4)[0])
+
+    # the same board with its colors relabeled shares the entry
+    swapped = Board([[(c + 1) % 6 for c in row] for row in GRID])
+    assert canonical(swapped, 0)[0] == canonical(Board(GRID), 0)[0]
+    depth, _, move = book.probe(swapped, 0)
+    assert move == (line[0] + 1) % 6 and depth == 4
+    lines = []
+    Engine(swapped, book=book).search(0, 6, lambda line, value: lines.append(line))
+    assert len(lines) == 2 and lines[0][0] == move
@@ -0,0 +1,37 @@
+from src.board import Board
+from src.endgame import EndgameSolver
+from src.engine import Engine
+from src.tile import Colors
+from tests.test_board import GRID
+
+
+def play_until(board: Board, free: int) -> int:
+    player = 0
+    while (board.full & ~(board.owned[0] | board.owned[1])).bit_count() > free:
+        colors = [c for c in Colors if c != Colors.empty and c not in board.player_colors]
+        board.move(max(colors, key=lambda c: board.capture_size(c, player)), player)
+        player ^= 1
+    return player
+
+
+def test_solver_line_reaches_its_margin():
+    board = Board(GRID)
+    player = play_until(board, 8)
+    solver = EndgameSolver(8)
+    assert solver.applies(board)
+    assert solver.solve(board, player) == EndgameSolver(8).solve(board.clone(), player)
+    margin, line = solver.best_line(board, player)
+    for color in line:
+        assert board.move(color, player)
+        player ^= 1
+    assert board.win() != -1
+    assert board.tile_count(player) - board.tile_count(player ^ 1) == margin * (1 if len(line) % 2 == 0 else -1)
+
+
+def test_engine_reports_solved_root():
+    board = Board(GRID)
+    player = play_until(board, 8)
+    engine = Engine(board)
+    score, path = engine.search(player, 10)
+    assert engine.endgame_margin == engine.endgame.solve(board.clone(), player)
+    assert path
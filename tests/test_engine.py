@@ -0,0 +1,187 @@
+import asyncio
+
+from src.board import Board
+from src.tile import Colors
+from src.engine import Engine
+from src.telemetry import new_phases
+from src.transposition import TranspositionTable, EXACT, LOWER
+from tests.test_board import GRID
+
+
+def test_replacement_policies():
+    deep = TranspositionTable(max_mb=0, policy="depth")
+    deep.store(1, 6, 1.0, EXACT, None)
+    deep.store(2, 2, 2.0, LOWER, None)
+    assert deep.probe(1)[1] == 6 and deep.probe(2) is None
+    deep.new_search()
+    deep.store(2, 2, 2.0, LOWER, None)
+    assert deep.probe(2)[2] == 2.0
+
+    always = TranspositionTable(max_mb=0, policy="always")
+    always.store(1, 6, 1.0, EXACT, None)
+    always.store(2, 2, 2.0, LOWER, None)
+    assert always.probe(2) is not None
+
+
+def test_table_matches_plain_search():
+    lines = []
+    engine = Engine(Board(GRID))
+    asyncio.run(engine.IDDFS(0, 6, lambda path, score: lines.append((path, score))))
+    cold = Engine(Board(GRID), TranspositionTable(max_mb=0))
+    score, path = cold.get_moves(0, 6)
+    assert lines[-1][1] == score
+    assert len(lines[-1][0]) == 6
+
+
+def test_budgeted_search_returns_completed_iteration():
+    lines = []
+    engine = Engine(Board(GRID))
+    score, path = engine.search(0, 60, lambda line, value: lines.append((line, value)), node_limit=2000)
+    assert engine.count <= 2100
+    assert (path, score) == lines[-1]
+
+    engine = Engine(Board(GRID))
+    score, path = engine.search(0, 60, time_limit=0.2)
+    assert path
+
+
+def test_cancelled_search_stops_its_thread():
+    async def run():
+        engine = Engine(Board(GRID))
+        lines = []
+        task = asyncio.create_task(engine.IDDFS(0, 60, lambda path, score: lines.append(path)))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        assert engine.stop.is_set()
+        await asyncio.to_thread(engine.lock.acquire, timeout=2)
+        engine.lock.release()
+        count = len(lines)
+        await asyncio.sleep(0.05)
+        assert lines and len(lines) == count
+
+    asyncio.run(run())
+
+
+def test_aspiration_windows_keep_the_score():
+    results = []
+    for aspiration in (0, 0.01, 1.0):
+        engine = Engine(Board(GRID))
+        engine.aspiration = aspiration
+        results.append(engine.search(0, 8)[0])
+    assert results[0] == results[1] == results[2]
+
+
+def test_pondered_reply_is_reused():
+    board = Board(GRID)
+    engine = Engine(board)
+    move = engine.search(0, 4)[1][0]
+    engine.ponder(0, 6)
+    assert engine.board is board
+
+    board.move(move, 0)
+    count = engine.count
+    score, path = engine.search(1, 6)
+    assert engine.count == count and engine.completed_depth == 6
+
+    fresh = Board(GRID)
+    fresh.move(move, 0)
+    assert Engine(fresh).search(1, 6)[0] == score
+
+
+def test_search_resumes_across_moves_and_undos():
+    board = Board(GRID)
+    engine = Engine(board)
+    score, path = engine.search(0, 8)
+    board.move(path[0], 0)
+    board.move(path[1], 1)
+    lines = []
+    engine.search(0, 8, lambda line, value: lines.append(engine.completed_depth))
+    assert lines[0] == 6
+
+    board.undo_move()
+    board.undo_move()
+    count = engine.count
+    assert engine.search(0, 8) == (score, path) and engine.count == count
+
+
+def test_iteration_stats_and_phase_timing():
+    streamed = []
+    engine = Engine(Board(GRID))
+    score, path = engine.search(0, 6, stats=streamed.append)
+    assert streamed == engine.iterations
+    assert [entry["depth"] for entry in streamed] == [2, 4, 6]
+    assert sum(entry["nodes"] for entry in streamed) == engine.count
+    assert all(0 <= entry["tt_hit_rate"] <= 1 for entry in streamed)
+
+    timed = Engine(Board(GRID))
+    timed.phases = new_phases()
+    assert timed.search(0, 6) == (score, path)
+    assert all(seconds > 0 for seconds in timed.phases.values())
+    assert "get_children" not in vars(timed)
+
+
+def test_selective_search_is_configurable():
+    plain = Engine(Board(GRID))
+    score, path = plain.search(0, 10)
+    selective = Engine(Board(GRID))
+    selective.lmr, selective.futility, selective.dead_moves = 1, 1.0, "prune"
+    selective_score, selective_path = selective.search(0, 10)
+    assert selective.count < plain.count
+    assert len(selective_path) == len(path) and abs(selective_score - score) < 3
+    assert selective.settings()["dead_moves"] == "prune"
+
+
+def test_board_moved_during_search_does_not_poison_results():
+    board = Board(GRID)
+    engine = Engine(board)
+    moved = []
+
+    def move_board():
+        # the app moving the board on the UI thread while the search is still running
+        if not moved:
+            moved.append(board.move(Colors.black, 0))
+            engine.stop.set()
+        return False
+
+    engine.abort = move_board
+    engine.search(0, 6)
+    engine.abort = None
+    assert moved == [True]
+
+    # the same position as the board now holds, searched from scratch
+    fresh = Board(GRID)
+    fresh.move(Colors.black, 0)
+    count = engine.count
+    score, path = engine.search(0, 6)
+    assert engine.count > count
+    assert path[0] not in board.player_colors
+    assert score == Engine(fresh).search(0, 6)[0]
+
+
+def test_stop_between_shallow_iterations():
+    engine = Engine(Board(GRID))
+    lines = []
+    engine.search(0, 8, lambda path, score: (lines.append(path), engine.stop.set()))
+    assert len(lines) == 1 and engine.completed_depth == 2
+
+
+def test_background_search_copies_the_board_when_called():
+    board = Board(GRID)
+    engine = Engine(board)
+
+    async def run():
+        # a previous search still holding the engine, while the app moves the board
+        engine.lock.acquire()
+        task = asyncio.create_task(engine.IDDFS(0, 4))
+        await asyncio.sleep(0.1)
+        board.move(Colors.black, 0)
+        engine.lock.release()
+        return await task
+
+    score, path = asyncio.run(run())
+    assert score == Engine(Board(GRID)).search(0, 4)[0]
+    assert Board(GRID).move(path[0], 0)
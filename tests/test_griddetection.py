@@ -0,0 +1,58 @@
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+import numpy as np
+
+from src.analyze import read_positions
+from src.griddetection import GridDetection, UncertainCells, detect_all, image_paths
+from tests.test_board import GRID
+
+
+def screenshot(path, grid, cell=90):
+    """A tall phone-sized gray image with the board drawn below the top"""
+    detector = GridDetection()
+    img = np.full((2400, 1100, 3), 225, np.uint8)
+    top, left = 800, 150
+    for i, row in enumerate(grid):
+        for j, color in enumerate(row):
+            rgb = detector.hex_to_nparr(color)
+            img[top + i * cell:top + (i + 1) * cell, left + j * cell:left + (j + 1) * cell] = rgb[::-1]
+    cv2.imwrite(str(path), img)
+
+
+def test_detects_drawn_board(tmp_path):
+    screenshot(tmp_path / "a.png", GRID)
+    (tmp_path / "notes.txt").write_text("not an image")
+    detector = GridDetection()
+    detector.process(tmp_path / "a.png")
+    assert detector.get_board() == GRID
+    assert set(detector.timings) == {"read", "locate", "sample", "classify"}
+
+    screenshot(tmp_path / "b.png", GRID[::-1])
+    results = list(detect_all(image_paths([str(tmp_path)]) + [tmp_path / "missing.png"], workers=2))
+    assert [r.get("board") for r in results[:2]] == [GRID, GRID[::-1]]
+    assert "error" in results[2]
+    assert [p["board"] for p in read_positions([str(tmp_path)])] == [GRID, GRID[::-1]]
+
+
+def test_uncertain_cells_are_flagged_and_palette_is_cached(tmp_path):
+    screenshot(tmp_path / "a.png", GRID)
+    img = cv2.imread(str(tmp_path / "a.png"))
+    # a phone rendering every color a little darker than the stock palette
+    img[800:800 + 7 * 90, 150:150 + 8 * 90] -= 4
+    cv2.imwrite(str(tmp_path / "a.png"), img)
+    cache = tmp_path / "palettes.json"
+    detector = GridDetection(cache)
+    detector.process(tmp_path / "a.png")
+    assert detector.confidence.min() > 0.9
+    calibrated = detector.palette(detector.profile)
+    reloaded = GridDetection(cache).palette(detector.profile)
+    assert not np.allclose(calibrated, detector.default_palette)
+    assert np.array_equal(reloaded, calibrated)
+
+    img = cv2.imread(str(tmp_path / "a.png"))
+    img[800 + 20:800 + 70, 150 + 20:150 + 70] = (131, 85, 168)  # first cell halfway between red and purple
+    cv2.imwrite(str(tmp_path / "b.png"), img)
+    with pytest.raises(UncertainCells) as error:
+        GridDetection(cache).process(tmp_path / "b.png")
+    assert error.value.cells == [(0, 0)]
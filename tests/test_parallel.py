@@ -0,0 +1,81 @@
+import pickle
+import threading
+import time
+
+from src.board import Board
+from src.engine import Engine
+from src.parallel import ParallelEngine
+from src.transposition import SharedTranspositionTable, EXACT, LOWER
+from tests.test_board import GRID
+
+
+def test_shared_table_is_shared_when_pickled():
+    table = SharedTranspositionTable(max_mb=0)
+    try:
+        table.store(1, 6, 1.5, EXACT, 3)
+        table.store(2, 2, 2.0, LOWER, None)
+        assert table.probe(1)[1:5] == (6, 1.5, EXACT, 3) and table.probe(2) is None
+        copy = pickle.loads(pickle.dumps(table))
+        copy.new_search() # only the creator moves to a new search
+        copy.store(2, 2, 2.0, LOWER, None)
+        assert table.probe(2) is None
+        table.new_search()
+        copy.store(2, 2, -2.0, LOWER, None)
+        assert table.probe(2)[1:5] == (2, -2.0, LOWER, None)
+        copy.close()
+    finally:
+        table.close()
+
+
+def test_parallel_matches_engine(capfd):
+    score, line = Engine(Board(GRID)).search(0, 6)
+    engine = ParallelEngine(Board(GRID), 2)
+    try:
+        parallel_score, parallel_line = engine.search(0, 6)
+        assert engine.completed_depth == 6
+        assert parallel_score == score
+        assert Board(GRID).move(parallel_line[0], 0)
+    finally:
+        engine.close()
+    assert capfd.readouterr().err == ""
+
+
+def test_parallel_stops_helpers(capfd):
+    engine = ParallelEngine(Board(GRID), 2)
+    stop = threading.Event()
+    timer = threading.Timer(0.5, stop.set)
+    timer.start()
+    start = time.monotonic()
+    try:
+        engine.search(0, 60, stop=stop)
+        assert time.monotonic() - start < 5
+    finally:
+        timer.cancel()
+        # the helper was told to stop as well, so closing doesn't wait on a search
+        start = time.monotonic()
+        engine.close()
+    assert time.monotonic() - start < 2
+    assert capfd.readouterr().err == ""
+
+
+def test_close_waits_for_ponder(capfd):
+    engine = ParallelEngine(Board(GRID), 2)
+    engine.search(0, 4)
+    errors = []
+
+    def ponder():
+        try:
+            engine.ponder(0, 60)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=ponder)
+    thread.start()
+    time.sleep(0.3)
+    engine.close()
+    thread.join(5)
+    assert not thread.is_alive() and errors == []
+    # a search after closing runs on its own table instead of the freed one
+    score, line = engine.search(0, 4)
+    assert line
+    assert capfd.readouterr().err == ""
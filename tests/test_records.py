@@ -0,0 +1,47 @@
+import random
+
+from src.board import Board
+from src.records import GameArchive, analyze_archive, append, game_record, replay, restore
+from tests.test_board import GRID
+
+
+def play(board, moves, seed):
+    rng = random.Random(seed)
+    player = 0
+    for _ in range(moves):
+        colors = [c for c in range(6) if c not in board.player_colors]
+        board.move(rng.choice(colors), player)
+        player ^= 1
+    return board
+
+
+def test_archive_round_trip(tmp_path):
+    setup = [list(row) for row in GRID]
+    setup[5][0] = setup[6][0] # joined to player 0's corner before any move
+    boards = [play(Board(GRID), 12, 0), play(Board(setup), 7, 1), Board(GRID)]
+    path = tmp_path / "games.frec"
+    assert append(path, [game_record(boards[0])]) == 1
+    assert append(path, map(game_record, boards[1:])) == 2
+    assert path.stat().st_size == 8 + 3 * 25 + 12 + 7
+
+    archive = GameArchive(path)
+    assert len(archive) == 3
+    for board, (grid, moves) in zip(boards, archive):
+        restored = restore(grid, moves)
+        assert (restored.owned, restored.player_colors, restored.key(0)) == (board.owned, board.player_colors, board.key(0))
+        assert len(restored.stack) == len(board.stack)
+
+    grid, moves = archive[0]
+    positions = [(board.key(player), color) for board, player, color in replay(grid, moves)]
+    assert len(positions) == 12 and positions[0][0] == Board(GRID).key(0)
+
+
+def test_analyze_archive(tmp_path):
+    path = tmp_path / "games.frec"
+    append(path, [game_record(play(Board(GRID), 4, 2)), game_record(play(Board(GRID), 2, 3))])
+    results = list(analyze_archive(path, depth=2))
+    assert [(r["record"], r["ply"]) for r in results] == [(0, 0), (0, 1), (0, 2), (0, 3), (1, 0), (1, 1)]
+    assert all(r["move"] and r["depth"] == 2 for r in results)
+
+    append(path, [game_record(play(Board(GRID), 3, 4))])
+    assert [r["record"] for r in analyze_archive(path, depth=2)][-3:] == [2, 2, 2]
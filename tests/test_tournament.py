@@ -0,0 +1,33 @@
+import math
+
+import pytest
+
+from src.board import Board
+from src.tile import Colors
+from src.tournament import elo, parse_config, run_match, summarize
+from tests.test_board import GRID
+
+
+def test_parse_config():
+    config = parse_config("depth=6,time=0.5,frontier=0.25")
+    assert (config["depth"], config["time"], config["nodes"]) == (6, 0.5, None)
+    assert config["weights"] == (1.0, 1.0, 0.25)
+    with pytest.raises(ValueError):
+        parse_config("speed=3")
+
+
+def test_weights_change_eval():
+    board = Board(GRID)
+    board.move(Colors.black, 0)
+    assert board.eval(0, (1.0, 1.0, 1.0)) == board.eval(0)
+    assert board.eval(0, (1.0, 0.0, 0.0)) == board.tile_count(0) - board.tile_count(1)
+
+
+def test_match_summary():
+    games = list(run_match(parse_config("depth=2"), parse_config("depth=2"), games=4, seed=1))
+    assert [game["swapped"] for game in games] == [False, True, False, True]
+    summary = summarize(games)
+    assert summary["wins"] + summary["draws"] + summary["losses"] == 4
+    assert summary["a"]["moves"] and summary["b"]["nodes_per_move"] > 0
+    assert elo(0.5) == 0 and elo(1.0) == math.inf
+    assert elo(0.75) == pytest.approx(190.85, abs=0.01)